@@ -1,15 +1,18 @@
 from django.contrib import admin
-from .models import PortfolioItem
+from .models import PortfolioItem, IndexOutbox, IndexBuild, Conversation, ConversationTurn, PrecomputedAnswer, QueryLog
+from . import answers
+from . import llm
+from . import search
 from django.conf import settings
 import os
 import json
 
 @admin.register(PortfolioItem)
 class PortfolioItemAdmin(admin.ModelAdmin):
-    list_display = ('title', 'source_type', 'source_url', 'created_at', 'metadata')
-    list_filter = ('source_type', 'created_at')
+    list_display = ('title', 'tenant', 'source_type', 'source_url', 'created_at', 'metadata')
+    list_filter = ('tenant', 'source_type', 'created_at')
     search_fields = ('title', 'content', 'source_url')
-    fields = ('title', 'source_type', 'source_url', 'content', 'metadata')
+    fields = ('title', 'tenant', 'source_type', 'source_url', 'content', 'metadata')
     readonly_fields = ('created_at', 'updated_at', 'vector_id')
 
     def save_model(self, request, obj, form, change):
@@ -27,7 +30,92 @@ class PortfolioItemAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
         self.message_user(request, f"Successfully saved {obj.title or obj.id}")
 
+    def get_search_results(self, request, queryset, search_term):
+        # Served by the full-text index instead of LIKE scans over every content blob
+        if not search_term:
+            return super().get_search_results(request, queryset, search_term)
+        return search.search_items(queryset, search_term), False
+
     def get_form(self, request, obj=None, **kwargs):
         form = super().get_form(request, obj, **kwargs)
         form.base_fields['metadata'].widget.attrs['placeholder'] = '{"About_me": "AboutMe.pdf"}'
-        return form
\ No newline at end of file
+        return form
+
+@admin.register(IndexOutbox)
+class IndexOutboxAdmin(admin.ModelAdmin):
+    list_display = ('vector_id', 'tenant', 'operation', 'attempts', 'last_error', 'updated_at')
+    list_filter = ('tenant', 'operation')
+    readonly_fields = ('item_id', 'vector_id', 'tenant', 'operation', 'attempts', 'last_error', 'created_at', 'updated_at')
+
+
+@admin.register(IndexBuild)
+class IndexBuildAdmin(admin.ModelAdmin):
+    list_display = ('collection_name', 'tenant', 'model_name', 'status', 'items_indexed', 'items_total', 'activated_at')
+    list_filter = ('tenant', 'status')
+    readonly_fields = (
+        'tenant', 'collection_name', 'model_name', 'status', 'last_item_id', 'items_indexed', 'items_total',
+        'error', 'created_at', 'updated_at', 'activated_at'
+    )
+
+
+class ConversationTurnInline(admin.TabularInline):
+    model = ConversationTurn
+    fields = ('query', 'standalone_query', 'response', 'created_at')
+    readonly_fields = fields
+    extra = 0
+
+
+@admin.register(Conversation)
+class ConversationAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tenant', 'summarized_turns', 'created_at', 'updated_at')
+    list_filter = ('tenant',)
+    readonly_fields = ('summary', 'summarized_turns', 'created_at', 'updated_at')
+    inlines = [ConversationTurnInline]
+
+
+@admin.register(PrecomputedAnswer)
+class PrecomputedAnswerAdmin(admin.ModelAdmin):
+    list_display = ('question', 'tenant', 'stale', 'model_name', 'generated_at')
+    list_filter = ('tenant', 'stale')
+    search_fields = ('question',)
+    fields = ('tenant', 'question', 'response', 'stale', 'sources', 'model_name', 'generated_at')
+    readonly_fields = ('sources', 'model_name', 'generated_at')
+    actions = ['generate_answers']
+
+    def save_model(self, request, obj, form, change):
+        # An edited question needs a new embedding before it can be matched again
+        if 'question' in form.changed_data:
+            obj.stale = True
+        super().save_model(request, obj, form, change)
+
+    @admin.action(description="Generate answers for selected questions")
+    def generate_answers(self, request, queryset):
+        generated = failed = skipped = 0
+        for answer in queryset.order_by('id'):
+            try:
+                if answers.generate(answer) is None:
+                    skipped += 1
+                    continue
+            except llm.LLMError as e:
+                self.message_user(request, f"Failed to answer '{answer.question[:50]}': {e.message}", level='error')
+                failed += 1
+                continue
+            except Exception as e:
+                self.message_user(request, f"Failed to answer '{answer.question[:50]}': {e}", level='error')
+                failed += 1
+                continue
+            generated += 1
+        self.message_user(request, f"Generated {generated} answer(s), {failed} failed, {skipped} skipped as off-topic")
+
+
+@admin.register(QueryLog)
+class QueryLogAdmin(admin.ModelAdmin):
+    list_display = ('query', 'tenant', 'endpoint', 'status', 'precomputed', 'total_ms', 'created_at')
+    list_filter = ('tenant', 'endpoint', 'status', 'precomputed')
+    search_fields = ('query',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,141 @@
+from django.conf import settings
+from django.db.models import Count, Max, TextField, Value
+from django.db.models.functions import Coalesce, Lower, NullIf, Trim
+from django.utils import timezone
+import threading
+import logging
+
+from .models import PrecomputedAnswer, QueryLog
+from . import llm
+from . import retrieval
+from . import vector_store
+
+logger = logging.getLogger(__name__)
+
+# (tenant, model_name) -> (version, answer ids, normalized question embeddings)
+_matrices = {}
+_matrices_lock = threading.Lock()
+
+
+def frequent_questions(tenant, limit, min_count=2):
+    """
+    Mines the query log for the questions asked most often, normalized for case and whitespace.
+
+    Follow-ups are counted by their standalone rewrite, which is what retrieval actually sees.
+    """
+    text = Coalesce(NullIf('retrieval_query', Value('', output_field=TextField())), 'query')
+    rows = (
+        QueryLog.objects.filter(tenant=tenant, status=200)
+        .annotate(question=Lower(Trim(text)))
+        .values('question')
+        .annotate(asked=Count('id'))
+        .filter(asked__gte=min_count)
+        .order_by('-asked', 'question')[:limit]
+    )
+    return [(row['question'], row['asked']) for row in rows]
+
+
+def add_questions(tenant, questions):
+    """Registers questions to precompute; existing ones are left untouched. Returns how many were new."""
+    created = 0
+    for question in questions:
+        question = question.strip()
+        if question:
+            _, was_created = PrecomputedAnswer.objects.get_or_create(tenant=tenant, question=question)
+            created += was_created
+    return created
+
+
+def generate(answer, target=None):
+    """
+    Answers the question against the tenant's active index and records the items it was built from.
+
+    Returns None, leaving the answer untouched, when no item is close enough to the question;
+    such questions get the off-topic response at query time anyway.
+    """
+    target = target or vector_store.active_index(answer.tenant)
+    embedding = retrieval.embed_query(answer.question, target)
+    retrieved = retrieval.retrieve(embedding, answer.tenant, target)
+    items = retrieved.items
+    if not items:
+        logger.info(f"Skipped precomputed answer {answer.pk}: no item is relevant to '{answer.question[:50]}'")
+        return None
+    answer.response = llm.chat(llm.rag_messages(answer.question, retrieved.context))
+    answer.question_embedding = [float(value) for value in embedding]
+    answer.model_name = target.model_name
+    answer.sources = {str(item.pk): item.content_hash for item in items}
+    answer.stale = False
+    answer.generated_at = timezone.now()
+    answer.save()
+    logger.info(f"Precomputed answer {answer.pk} for '{answer.question[:50]}' from {len(items)} item(s)")
+    return answer
+
+
+def needs_generation(tenant=None):
+    """Answers that are stale, were never generated, or were embedded with a model that is no longer active."""
+    answers = PrecomputedAnswer.objects.all()
+    if tenant:
+        answers = answers.filter(tenant=tenant)
+    pending = []
+    for answer in answers.order_by('id'):
+        if answer.stale or answer.model_name != vector_store.active_index(answer.tenant).model_name:
+            pending.append(answer)
+    return pending
+
+
+def mark_stale(item, deleted=False):
+    """Flags the answers generated from this item if its content has changed or it was deleted."""
+    key = str(item.pk)
+    stale_ids = [
+        answer_id
+        for answer_id, sources in PrecomputedAnswer.objects.filter(
+            stale=False, sources__has_key=key
+        ).values_list('id', 'sources')
+        if deleted or sources.get(key) != item.content_hash
+    ]
+    if stale_ids:
+        # updated_at is set explicitly so in-process match caches notice the change
+        PrecomputedAnswer.objects.filter(id__in=stale_ids).update(stale=True, updated_at=timezone.now())
+        logger.info(f"Item {item.pk} changed; marked {len(stale_ids)} precomputed answer(s) stale")
+
+
+def _matrix(tenant, model_name):
+    import numpy as np
+
+    answers = PrecomputedAnswer.objects.filter(tenant=tenant, model_name=model_name, stale=False)
+    version = tuple(answers.aggregate(count=Count('id'), latest=Max('updated_at')).values())
+    cached = _matrices.get((tenant, model_name))
+    if cached and cached[0] == version:
+        return cached[1], cached[2]
+    rows = list(answers.exclude(question_embedding__isnull=True).values_list('id', 'question_embedding'))
+    ids = [answer_id for answer_id, _ in rows]
+    if rows:
+        matrix = np.asarray([embedding for _, embedding in rows], dtype=np.float32)
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    else:
+        matrix = np.empty((0, 0), dtype=np.float32)
+    with _matrices_lock:
+        _matrices[(tenant, model_name)] = (version, ids, matrix)
+    return ids, matrix
+
+
+def match(tenant, query_embedding, model_name):
+    """
+    Finds the precomputed answer whose question is closest to the query.
+
+    Returns:
+        tuple: (PrecomputedAnswer, cosine similarity), or None below settings.PRECOMPUTED_ANSWER_SIMILARITY.
+    """
+    import numpy as np
+
+    ids, matrix = _matrix(tenant, model_name)
+    if not ids:
+        return None
+    query = np.asarray(query_embedding, dtype=np.float32)
+    scores = matrix @ (query / max(float(np.linalg.norm(query)), 1e-12))
+    best = int(scores.argmax())
+    similarity = float(scores[best])
+    if similarity < settings.PRECOMPUTED_ANSWER_SIMILARITY:
+        return None
+    answer = PrecomputedAnswer.objects.filter(pk=ids[best], stale=False).first()
+    return (answer, similarity) if answer else None
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AssistantConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'assistant'
+
+    def ready(self):
+        from . import signals  # noqa: F401
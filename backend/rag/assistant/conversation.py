@@ -0,0 +1,107 @@
+from django.conf import settings
+import logging
+
+from .models import ConversationTurn
+from . import llm
+from .deadline import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+REWRITE_PROMPT = (
+    "Rewrite the user's latest message as one standalone search query about the portfolio, resolving "
+    "pronouns and references from the conversation. Reply with the query only."
+)
+SUMMARY_PROMPT = (
+    "Update the running summary of a conversation between a user and a portfolio assistant with the new "
+    "exchanges. Keep names, facts and questions the user may refer back to. Reply with the summary only, "
+    "in at most {words} words."
+)
+
+
+def clip(text):
+    limit = settings.CONVERSATION_TURN_CHARS
+    return text if len(text) <= limit else text[:limit] + '…'
+
+
+def recent_turns(conversation):
+    """The last few turns, sent verbatim; everything older is represented by the summary."""
+    turns = list(conversation.turns.order_by('-id')[:settings.CONVERSATION_RECENT_TURNS])
+    return turns[::-1]
+
+
+def history_messages(conversation, turns):
+    messages = []
+    if conversation.summary:
+        messages.append({"role": "system", "content": f"Summary of the earlier conversation: {conversation.summary}"})
+    for turn in turns:
+        messages.append({"role": "user", "content": clip(turn.query)})
+        messages.append({"role": "assistant", "content": clip(turn.response)})
+    return messages
+
+
+def standalone_query(conversation, query, turns, deadline=None):
+    """Rewrites a follow-up into a self-contained retrieval query; the first turn is used as-is."""
+    if not turns and not conversation.summary:
+        return query
+    messages = [{"role": "system", "content": REWRITE_PROMPT}]
+    messages += history_messages(conversation, turns)
+    messages.append({"role": "user", "content": query})
+    try:
+        rewritten = llm.chat(messages, max_tokens=settings.CONVERSATION_REWRITE_TOKENS, deadline=deadline).strip()
+    except (llm.LLMError, DeadlineExceeded) as e:
+        logger.warning(f"Query rewrite failed, retrieving with the raw query: {e}")
+        return query
+    logger.debug(f"Rewrote follow-up '{query}' as '{rewritten}'")
+    return rewritten or query
+
+
+def answer_messages(conversation, turns, query, context):
+    messages = [{"role": "system", "content": llm.SYSTEM_PROMPT}]
+    messages += history_messages(conversation, turns)
+    messages.append({"role": "user", "content": f"Query: {query}\nContext: {context}"})
+    return messages
+
+
+def record_turn(conversation, query, standalone, response, deadline=None):
+    turn = ConversationTurn.objects.create(
+        conversation=conversation,
+        query=query,
+        standalone_query=standalone,
+        response=response
+    )
+    summarize(conversation, deadline)
+    return turn
+
+
+def summarize(conversation, deadline=None):
+    """
+    Folds turns that have left the recent window into the rolling summary.
+
+    Runs once at least CONVERSATION_SUMMARY_BATCH turns are waiting, so the extra LLM call is
+    amortized over several turns. It shares the request's deadline: with less than
+    CONVERSATION_SUMMARY_MIN_TIME seconds left the summary is postponed, and on failure the turns
+    are simply retried on the next call.
+    """
+    total = conversation.turns.count()
+    pending = total - conversation.summarized_turns - settings.CONVERSATION_RECENT_TURNS
+    if pending < settings.CONVERSATION_SUMMARY_BATCH:
+        return
+    if deadline and deadline.remaining() < settings.CONVERSATION_SUMMARY_MIN_TIME:
+        logger.info(f"Postponing the summary of conversation {conversation.id}: {deadline.remaining():.1f}s left")
+        return
+    start = conversation.summarized_turns
+    turns = list(conversation.turns.order_by('id')[start:start + pending])
+    transcript = "\n".join(f"User: {clip(turn.query)}\nAssistant: {clip(turn.response)}" for turn in turns)
+    messages = [
+        {"role": "system", "content": SUMMARY_PROMPT.format(words=settings.CONVERSATION_SUMMARY_WORDS)},
+        {"role": "user", "content": f"Current summary: {conversation.summary or '(empty)'}\n\nNew exchanges:\n{transcript}"},
+    ]
+    try:
+        summary = llm.chat(messages, max_tokens=settings.CONVERSATION_SUMMARY_TOKENS, deadline=deadline).strip()
+    except (llm.LLMError, DeadlineExceeded) as e:
+        logger.warning(f"Conversation summary failed for {conversation.id}: {e}")
+        return
+    conversation.summary = summary
+    conversation.summarized_turns = start + len(turns)
+    conversation.save(update_fields=['summary', 'summarized_turns', 'updated_at'])
+    logger.info(f"Summarized {len(turns)} turn(s) of conversation {conversation.id}")
@@ -0,0 +1,27 @@
+import time
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's time budget runs out; `stage` names the step that could not start or finish."""
+
+    def __init__(self, stage):
+        super().__init__(f"Request deadline exceeded during {stage}")
+        self.stage = stage
+
+
+class Deadline:
+    """An overall time budget shared by the embedding, retrieval and generation stages of one request."""
+
+    def __init__(self, seconds):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def check(self, stage):
+        if self.remaining() <= 0:
+            raise DeadlineExceeded(stage)
+
+    def timeout(self, limit):
+        """Caps a per-call timeout to what is left of the budget."""
+        return min(limit, self.remaining())
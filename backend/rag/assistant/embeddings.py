@@ -0,0 +1,42 @@
+from django.conf import settings
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Several models can be loaded at once while a reindex migrates to a new one
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_model(model_name=None):
+    model_name = model_name or settings.EMBEDDING_MODEL_NAME
+    if model_name not in _models:
+        with _models_lock:
+            if model_name not in _models:
+                # Deferred: importing sentence_transformers pulls in torch and transformers
+                from sentence_transformers import SentenceTransformer
+                logger.info(f"Initializing SentenceTransformer model: {model_name}")
+                _models[model_name] = SentenceTransformer(model_name)
+    return _models[model_name]
+
+
+def encode(texts, model_name=None):
+    """Embeds a list of texts in one batch and returns plain Python lists."""
+    logger.info(f"Generating embeddings for {len(texts)} text(s)")
+    return get_model(model_name).encode(list(texts)).tolist()
+
+
+def preload():
+    """Loads the models of every active index and opens the vector store, for serving workers only."""
+    from .models import IndexBuild
+    from . import vector_store
+
+    model_names = {settings.EMBEDDING_MODEL_NAME}
+    model_names |= set(
+        IndexBuild.objects.filter(status=IndexBuild.STATUS_ACTIVE).values_list('model_name', flat=True)
+    )
+    for model_name in sorted(model_names):
+        get_model(model_name)
+    vector_store.get_client()
+    logger.info(f"Preloaded embedding models: {', '.join(sorted(model_names))}")
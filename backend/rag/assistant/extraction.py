@@ -0,0 +1,218 @@
+# Parsing libraries are imported on first use so that management commands, the admin and
+# workers that never ingest content do not pay for loading them.
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+import hashlib
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# OCR runs in a small pool of worker processes shared by every upload in this process, so a
+# large scanned PDF occupies at most OCR_WORKERS cores and cannot stall other requests for longer
+# than OCR_DOCUMENT_TIMEOUT. Workers only shell out to poppler and Tesseract.
+_ocr_pool = None
+_ocr_pool_lock = threading.Lock()
+
+
+def extract_pdf_text(pdf_path):
+    """
+    Returns the concatenated text of every page, or an empty string if there is none.
+
+    Pages without a text layer are run through OCR when settings.OCR_ENABLED is set.
+    """
+    import PyPDF2
+
+    with open(pdf_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        texts = [page.extract_text() or '' for page in reader.pages]
+        if settings.OCR_ENABLED:
+            scanned = {
+                index: page_hash(page)
+                for index, (page, text) in enumerate(zip(reader.pages, texts))
+                if not text.strip()
+            }
+            if scanned:
+                for index, text in ocr_pages(pdf_path, scanned).items():
+                    texts[index] = f"{text}\n" if text else ''
+    return ''.join(texts).strip()
+
+
+def page_hash(page):
+    """Identifies a page by its drawing instructions and images, so re-uploads reuse earlier OCR."""
+    digest = hashlib.sha256(f"{settings.OCR_LANGUAGES}:{settings.OCR_DPI}".encode())
+    digest.update(f"{list(page.mediabox)}:{page.get('/Rotate', 0)}".encode())
+    contents = page.get_contents()
+    if contents is not None:
+        digest.update(contents.get_data())
+    resources = page.get('/Resources')
+    xobjects = resources.get_object().get('/XObject') if resources else None
+    xobjects = xobjects.get_object() if xobjects else {}
+    for name in sorted(xobjects):
+        xobject = xobjects[name].get_object()
+        try:
+            digest.update(xobject.get_data())
+        except Exception:
+            # Some image filters cannot be decoded by PyPDF2; the encoded bytes identify them just as well
+            digest.update(getattr(xobject, '_data', b''))
+    return digest.hexdigest()
+
+
+def ocr_pages(pdf_path, hashes):
+    """
+    Recognizes the text of the given pages, serving repeated pages from the OCR cache.
+
+    Args:
+        pdf_path: The PDF to render.
+        hashes: {page index: page_hash()} of the pages that have no text layer.
+
+    Returns:
+        dict: {page index: text} for every page that was cached or finished within
+        settings.OCR_DOCUMENT_TIMEOUT; pages that timed out or failed are left out.
+    """
+    texts = {}
+    missing = {}
+    for index, key in hashes.items():
+        cached = _read_cache(key)
+        if cached is None:
+            missing[index] = key
+        else:
+            texts[index] = cached
+    if not missing:
+        return texts
+    tools = [settings.OCR_PDFTOPPM_CMD, settings.OCR_TESSERACT_CMD]
+    unavailable = [tool for tool in tools if not shutil.which(tool)]
+    if unavailable:
+        logger.warning(f"Skipping OCR of {len(missing)} page(s) in {pdf_path}: {', '.join(unavailable)} not found")
+        return texts
+
+    logger.info(f"Running OCR on {len(missing)} page(s) of {pdf_path} ({len(texts)} cached)")
+    started = time.monotonic()
+    # Workers get an absolute deadline so pages that waited in the queue get less time
+    deadline = time.time() + settings.OCR_DOCUMENT_TIMEOUT
+    pool = _get_pool()
+    try:
+        futures = {
+            pool.submit(
+                ocr_page, str(pdf_path), index, deadline, settings.OCR_DPI, settings.OCR_LANGUAGES,
+                settings.OCR_PDFTOPPM_CMD, settings.OCR_TESSERACT_CMD
+            ): index
+            for index in missing
+        }
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+    done, pending = wait(futures, timeout=settings.OCR_DOCUMENT_TIMEOUT)
+    for future in pending:
+        future.cancel()
+    for future in done:
+        index = futures[future]
+        try:
+            text = future.result()
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                _discard_pool(pool)
+            logger.error(f"OCR failed for page {index + 1} of {pdf_path}: {str(e)}")
+            continue
+        if text is None:
+            continue
+        texts[index] = text
+        _write_cache(missing[index], text)
+    if pending or len(texts) < len(hashes):
+        logger.warning(
+            f"OCR finished {len(texts)} of {len(hashes)} page(s) of {pdf_path} "
+            f"within {settings.OCR_DOCUMENT_TIMEOUT}s"
+        )
+    logger.info(f"OCR of {pdf_path} took {time.monotonic() - started:.1f}s")
+    return texts
+
+
+def ocr_page(pdf_path, index, deadline, dpi, languages, pdftoppm_cmd, tesseract_cmd):
+    """
+    Renders one page with pdftoppm and reads it with Tesseract; runs in an OCR worker process.
+
+    Returns None when the page could not be finished before `deadline` (a time.time() value).
+    """
+    try:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return None
+        image = subprocess.run(
+            [pdftoppm_cmd, '-f', str(index + 1), '-l', str(index + 1), '-r', str(dpi), '-gray', '-png', pdf_path],
+            capture_output=True, check=True, timeout=remaining
+        ).stdout
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return None
+        result = subprocess.run(
+            [tesseract_cmd, 'stdin', 'stdout', '-l', languages],
+            input=image, capture_output=True, check=True, timeout=remaining
+        )
+    except subprocess.TimeoutExpired:
+        return None
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"{e.cmd[0]} exited with {e.returncode}: {e.stderr.decode(errors='replace').strip()}")
+    return result.stdout.decode('utf-8', errors='replace').strip()
+
+
+def _get_pool():
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is None:
+            # Spawned rather than forked so workers do not inherit database connections or locks
+            _ocr_pool = ProcessPoolExecutor(
+                max_workers=settings.OCR_WORKERS, mp_context=multiprocessing.get_context('spawn')
+            )
+        return _ocr_pool
+
+
+def _discard_pool(pool):
+    """A worker killed by the OS breaks the whole pool; the next document starts a fresh one."""
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is pool:
+            _ocr_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _cache_path(key):
+    return os.path.join(settings.OCR_CACHE_PATH, key[:2], f"{key}.txt")
+
+
+def _read_cache(key):
+    try:
+        with open(_cache_path(key), encoding='utf-8') as file:
+            return file.read()
+    except FileNotFoundError:
+        return None
+
+
+def _write_cache(key, text):
+    path = _cache_path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written next to the final name and renamed so concurrent readers never see a partial file
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=os.path.dirname(path), delete=False) as file:
+            file.write(text)
+        os.replace(file.name, path)
+    except OSError as e:
+        logger.warning(f"Could not cache OCR text for page {key}: {str(e)}")
+
+
+def scrape_web_text(url, timeout=10):
+    """Fetches a page and returns its visible text with scripts and styles removed."""
+    import requests
+    from bs4 import BeautifulSoup
+
+    response = requests.get(url, timeout=timeout)
+    soup = BeautifulSoup(response.text, 'html.parser')
+    for script in soup(["script", "style"]):
+        script.decompose()
+    return ' '.join(soup.stripped_strings).strip()
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+import hashlib
+import logging
+
+from .models import IndexVersion
+
+logger = logging.getLogger(__name__)
+
+# IndexVersion has exactly one row; its migration creates it
+VERSION_ID = 1
+
+
+def index_version():
+    """Returns the current index version; every PortfolioItem write moves it forward."""
+    version = IndexVersion.objects.filter(pk=VERSION_ID).values_list('version', flat=True).first()
+    return version or 0
+
+
+def bump():
+    """Invalidates every ETag handed out so far. Runs in the caller's transaction."""
+    versions = IndexVersion.objects.filter(pk=VERSION_ID)
+    if versions.update(version=F('version') + 1, updated_at=timezone.now()):
+        return
+    # The row is gone after a database flush. get_or_create() inserts in a savepoint, so losing the
+    # race to a concurrent bump() doesn't abort the caller's transaction on PostgreSQL.
+    IndexVersion.objects.get_or_create(pk=VERSION_ID)
+    versions.update(version=F('version') + 1, updated_at=timezone.now())
+
+
+def make_etag(*parts, weak=False):
+    """Builds a quoted ETag from the index version and whatever else selects the representation."""
+    digest = hashlib.sha256(repr((index_version(),) + parts).encode()).hexdigest()[:32]
+    return f'{"W/" if weak else ""}"{digest}"'
+
+
+def not_modified(request, etag):
+    """Returns a 304 (or 412 for a failed If-Match) when the client's copy is current, else None."""
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        set_validators(response, etag)
+    return response
+
+
+def set_validators(response, etag):
+    """Marks a successful response as cacheable by clients and proxies, revalidated with its ETag."""
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, max_age=settings.HTTP_CACHE_MAX_AGE, must_revalidate=True)
+    return response
@@ -0,0 +1,162 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from datetime import timedelta
+from itertools import groupby
+import logging
+
+from .models import PortfolioItem, IndexOutbox
+from . import vector_store
+from . import embeddings
+
+logger = logging.getLogger(__name__)
+
+
+def vector_id_for(item):
+    return item.vector_id or f"item_{item.pk}"
+
+
+def _enqueue(item, tenant, operation):
+    # One pending entry per vector: the latest operation wins, which keeps replays idempotent
+    IndexOutbox.objects.update_or_create(
+        tenant=tenant,
+        vector_id=vector_id_for(item),
+        defaults={"item_id": item.pk, "operation": operation, "attempts": 0, "last_error": ""}
+    )
+
+
+def enqueue_upsert(item):
+    previous_tenant = getattr(item, '_loaded_tenant', None)
+    if previous_tenant and previous_tenant != item.tenant:
+        _enqueue(item, previous_tenant, IndexOutbox.OPERATION_DELETE)
+    _enqueue(item, item.tenant, IndexOutbox.OPERATION_UPSERT)
+    item._loaded_tenant = item.tenant
+    schedule_sync()
+
+
+def enqueue_delete(item):
+    _enqueue(item, getattr(item, '_loaded_tenant', None) or item.tenant, IndexOutbox.OPERATION_DELETE)
+    schedule_sync()
+
+
+def schedule_sync():
+    if settings.INDEX_SYNC_ON_COMMIT:
+        transaction.on_commit(process_outbox, robust=True)
+
+
+def upsert_items(tenant, item_ids, target=None):
+    """Embeds and upserts the given items in one batch; items without content lose their vector."""
+    target = target or vector_store.active_index(tenant)
+    items = list(PortfolioItem.objects.filter(pk__in=item_ids, tenant=tenant).order_by('pk'))
+    indexable = [item for item in items if item.content]
+    indexable_ids = {item.pk for item in indexable}
+    stale = [f"item_{item_id}" for item_id in item_ids if item_id not in indexable_ids]
+    collection = vector_store.get_collection(tenant, target)
+    if indexable:
+        logger.info(f"Upserting {len(indexable)} item(s) into {target.collection_name}")
+        collection.upsert(
+            ids=[vector_id_for(item) for item in indexable],
+            embeddings=embeddings.encode([item.content for item in indexable], target.model_name),
+            metadatas=[vector_store.build_metadata(item) for item in indexable],
+            documents=[item.content for item in indexable]
+        )
+    if stale:
+        delete_vectors(tenant, stale, target)
+
+
+def delete_vectors(tenant, vector_ids, target=None):
+    target = target or vector_store.active_index(tenant)
+    logger.info(f"Deleting {len(vector_ids)} vector(s) from {target.collection_name}")
+    vector_store.get_collection(tenant, target).delete(ids=list(vector_ids))
+
+
+def process_outbox(batch_size=None, retry_failed=False):
+    """
+    Applies pending outbox entries to the vector store in batches.
+
+    Entries are only removed when their write succeeded and they were not re-enqueued
+    while the batch was in flight; failures stay in the outbox with an attempt count.
+    Since this runs after every commit, a failed entry is retried at most every
+    settings.INDEX_SYNC_RETRY_AFTER seconds and given up after settings.INDEX_SYNC_MAX_ATTEMPTS;
+    `manage.py reconcile_index` passes retry_failed=True and repairs whatever is left.
+
+    Returns:
+        tuple: (number of entries applied, number of entries that failed)
+    """
+    batch_size = batch_size or settings.INDEX_SYNC_BATCH_SIZE
+    applied = failed = 0
+    last_id = 0
+    pending = IndexOutbox.objects.all()
+    if not retry_failed:
+        pending = pending.filter(attempts__lt=settings.INDEX_SYNC_MAX_ATTEMPTS).filter(
+            Q(attempts=0) | Q(updated_at__lte=timezone.now() - timedelta(seconds=settings.INDEX_SYNC_RETRY_AFTER))
+        )
+    while True:
+        started_at = timezone.now()
+        entries = list(pending.filter(id__gt=last_id).order_by('id')[:batch_size])
+        if not entries:
+            break
+        last_id = entries[-1].id
+        entries.sort(key=lambda entry: (entry.tenant, entry.operation))
+        for (tenant, operation), group in groupby(entries, key=lambda entry: (entry.tenant, entry.operation)):
+            group = list(group)
+            entry_ids = [entry.id for entry in group]
+            try:
+                if operation == IndexOutbox.OPERATION_UPSERT:
+                    upsert_items(tenant, [entry.item_id for entry in group])
+                else:
+                    delete_vectors(tenant, [entry.vector_id for entry in group])
+            except Exception as e:
+                logger.error(f"Index sync {operation} failed for tenant {tenant}: {str(e)}", exc_info=True)
+                IndexOutbox.objects.filter(id__in=entry_ids).update(
+                    attempts=F('attempts') + 1,
+                    last_error=str(e),
+                    updated_at=timezone.now()  # Starts the retry backoff
+                )
+                failed += len(group)
+                continue
+            IndexOutbox.objects.filter(id__in=entry_ids, updated_at__lte=started_at).delete()
+            applied += len(group)
+    if applied or failed:
+        logger.info(f"Index outbox processed: applied={applied}, failed={failed}")
+    return applied, failed
+
+
+def diff_tenant(tenant, batch_size, target=None):
+    """
+    Compares database rows with the vectors stored for a tenant.
+
+    Returns:
+        tuple: (ids of items to upsert, vector ids to delete)
+    """
+    expected = {}
+    rows = PortfolioItem.objects.filter(tenant=tenant).exclude(content__isnull=True).exclude(content='')
+    for item_id, vector_id, content_hash in rows.values_list('id', 'vector_id', 'content_hash').iterator():
+        expected[vector_id or f"item_{item_id}"] = (item_id, content_hash)
+
+    to_delete = []
+    up_to_date = set()
+    for vector_id, metadata in vector_store.iter_indexed(tenant, batch_size, target):
+        if vector_id not in expected:
+            to_delete.append(vector_id)
+        elif metadata.get('content_hash') == expected[vector_id][1]:
+            up_to_date.add(vector_id)
+    to_upsert = [item_id for vector_id, (item_id, _) in expected.items() if vector_id not in up_to_date]
+    return sorted(to_upsert), to_delete
+
+
+def reconcile_tenant(tenant, batch_size=None, dry_run=False, target=None):
+    batch_size = batch_size or settings.INDEX_SYNC_BATCH_SIZE
+    target = target or vector_store.active_index(tenant)
+    started_at = timezone.now()
+    to_upsert, to_delete = diff_tenant(tenant, batch_size, target)
+    logger.info(f"Reconciling {target.collection_name}: {len(to_upsert)} to upsert, {len(to_delete)} to delete")
+    if not dry_run:
+        for start in range(0, len(to_upsert), batch_size):
+            upsert_items(tenant, to_upsert[start:start + batch_size], target)
+        for start in range(0, len(to_delete), batch_size):
+            delete_vectors(tenant, to_delete[start:start + batch_size], target)
+        # The diff covered every change made before it started, including the ones that kept failing
+        IndexOutbox.objects.filter(tenant=tenant, attempts__gt=0, updated_at__lte=started_at).delete()
+    return to_upsert, to_delete
@@ -0,0 +1,258 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from collections import namedtuple
+import threading
+import time
+import logging
+
+from .deadline import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = "You are a portfolio assistant. Provide accurate responses based solely on the provided portfolio context."
+
+# Runs provider calls so a slow primary can be hedged and the request deadline enforced. Each admitted
+# query may have one call per provider running; losing hedges and calls past their request's deadline
+# keep a worker until the provider timeout, and new calls queue behind them once all workers are busy.
+_executor = ThreadPoolExecutor(
+    max_workers=(settings.MAX_IN_FLIGHT.get('query') or 8) * max(1, len(settings.LLM_PROVIDERS)),
+    thread_name_prefix='llm'
+)
+_providers = None
+_providers_lock = threading.Lock()
+
+# Token counts are None when the provider does not report usage
+Completion = namedtuple('Completion', ['text', 'provider', 'prompt_tokens', 'completion_tokens'])
+
+
+class LLMError(Exception):
+    """Raised when the chat completion API fails; `message` and `details` go straight into the error response."""
+
+    def __init__(self, message, details=None):
+        super().__init__(message)
+        self.message = message
+        self.details = details
+
+
+class CircuitBreaker:
+    """Stops calling a provider after consecutive failures; after a cool-down one probe request is let through."""
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def available(self):
+        """Whether allow() could let a request through; unlike allow() it does not take the probe."""
+        with self.lock:
+            return self.opened_at is None or time.monotonic() - self.opened_at >= self.reset_timeout
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.opened_at = time.monotonic()  # Half-open: re-arm so only this probe goes through
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class BaseProvider:
+    def __init__(self, name, timeout=10, **options):
+        self.name = name
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(settings.LLM_CIRCUIT_FAILURES, settings.LLM_CIRCUIT_RESET)
+
+    def complete(self, messages, max_tokens, timeout):
+        """Returns a Completion or raises LLMError."""
+        raise NotImplementedError
+
+
+class OpenAICompatibleProvider(BaseProvider):
+    """Any `/chat/completions` endpoint speaking the OpenAI wire format (Groq, OpenAI, vLLM, Ollama, the mock server)."""
+
+    def __init__(self, name, base_url, model, api_key='', timeout=10, **options):
+        super().__init__(name, timeout, **options)
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.api_key = api_key
+
+    def complete(self, messages, max_tokens, timeout):
+        import requests
+
+        headers = {}
+        if self.api_key:
+            logger.info(f"Sending request to {self.name} with key: {self.api_key[:4]}...{self.api_key[-4:]}")
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        try:
+            response = requests.post(
+                f"{self.base_url}/chat/completions",
+                json={"model": self.model, "messages": messages, "max_tokens": max_tokens},
+                headers=headers,
+                timeout=timeout
+            )
+            llm_response = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.error(f"{self.name} request failed: {str(e)}")
+            raise LLMError(f"{self.name} communication error", str(e))
+        logger.debug(f"{self.name} response: {llm_response}")
+
+        if response.status_code != 200:
+            logger.error(f"{self.name} error: {llm_response.get('error', 'Unknown error')} (Status: {response.status_code})")
+            raise LLMError(f"{self.name} request failed", llm_response.get('error', 'Unknown error'))
+
+        if 'choices' not in llm_response or not llm_response['choices']:
+            logger.error(f"Invalid {self.name} response: {llm_response}")
+            raise LLMError(f"Invalid response from {self.name}", str(llm_response))
+
+        usage = llm_response.get('usage') or {}
+        return Completion(
+            llm_response['choices'][0]['message']['content'],
+            self.name,
+            usage.get('prompt_tokens'),
+            usage.get('completion_tokens')
+        )
+
+
+class MockProvider(BaseProvider):
+    """Offline stand-in that answers from the prompt itself; DELAY and FAIL simulate a slow or broken provider."""
+
+    def __init__(self, name, response=None, delay=0, fail=False, timeout=10, **options):
+        super().__init__(name, timeout, **options)
+        self.response = response
+        self.delay = delay
+        self.fail = fail
+
+    def complete(self, messages, max_tokens, timeout):
+        if self.delay:
+            time.sleep(min(self.delay, timeout))
+            if self.delay > timeout:
+                raise LLMError(f"{self.name} communication error", "Timed out")
+        if self.fail:
+            raise LLMError(f"{self.name} request failed", "Simulated failure")
+        text = self.response or f"Mock answer to: {messages[-1]['content'][:200]}"
+        # Rough whitespace token counts, enough to exercise the query log
+        prompt_tokens = sum(len(message['content'].split()) for message in messages)
+        return Completion(text, self.name, prompt_tokens, len(text.split()))
+
+
+def build_provider(config):
+    options = {key.lower(): value for key, value in config.items() if key not in ('NAME', 'BACKEND')}
+    return import_string(config['BACKEND'])(name=config['NAME'], **options)
+
+
+def get_providers():
+    """Providers from settings.LLM_PROVIDERS in fallback order; built once so circuit state persists."""
+    global _providers
+    if _providers is None:
+        with _providers_lock:
+            if _providers is None:
+                _providers = [build_provider(config) for config in settings.LLM_PROVIDERS]
+    return _providers
+
+
+@receiver(setting_changed)
+def reset_providers(setting, **kwargs):
+    global _providers
+    if setting in ('LLM_PROVIDERS', 'LLM_CIRCUIT_FAILURES', 'LLM_CIRCUIT_RESET'):
+        _providers = None
+
+
+def rag_messages(query, context):
+    """The single-turn prompt: the question plus the contents of the retrieved items."""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"Query: {query}\nContext: {context}"}
+    ]
+
+
+def chat(messages, max_tokens=None, deadline=None):
+    """Returns the text of chat_completion()."""
+    return chat_completion(messages, max_tokens, deadline).text
+
+
+def chat_completion(messages, max_tokens=None, deadline=None):
+    """
+    Sends a chat completion request, falling back through the configured providers.
+
+    Providers with an open circuit are skipped; a half-open provider only takes its probe when it is
+    actually called. A failure moves on to the next provider; if the current one has not answered
+    after settings.LLM_HEDGE_AFTER seconds the next one is started in parallel and the first
+    successful answer wins.
+
+    Args:
+        messages: OpenAI-style list of {"role", "content"} dicts.
+        max_tokens: Completion token limit; defaults to settings.LLM_MAX_TOKENS.
+        deadline: Optional Deadline shared with the other stages of the request.
+
+    Returns:
+        Completion: The first successful completion, with the provider that produced it.
+    """
+    max_tokens = max_tokens or settings.LLM_MAX_TOKENS
+    queue = [provider for provider in get_providers() if provider.breaker.available()]
+
+    pending = {}
+    errors = []
+
+    def launch():
+        """Starts the next provider whose circuit still lets it through; False once the queue is used up."""
+        while queue:
+            provider = queue.pop(0)
+            timeout = deadline.timeout(provider.timeout) if deadline else provider.timeout
+            if timeout <= 0:
+                raise DeadlineExceeded("generation")
+            if not provider.breaker.allow():
+                # Another request took the half-open probe since the queue was built
+                continue
+            logger.info(f"Sending chat completion to {provider.name} (timeout={timeout:.1f}s)")
+            pending[_executor.submit(provider.complete, messages, max_tokens, timeout)] = provider
+            return True
+        return False
+
+    if not launch():
+        raise LLMError("No LLM provider available", "All providers have an open circuit")
+    while pending:
+        wait_for = deadline.remaining() if deadline else None
+        hedging = bool(queue and settings.LLM_HEDGE_AFTER)
+        if hedging:
+            wait_for = settings.LLM_HEDGE_AFTER if wait_for is None else min(wait_for, settings.LLM_HEDGE_AFTER)
+        done, _ = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+        if not done:
+            # Without a hedge to start the wait only times out on the deadline
+            if not hedging or (deadline and deadline.remaining() <= 0):
+                raise DeadlineExceeded("generation")
+            logger.warning(f"No answer after {settings.LLM_HEDGE_AFTER}s, hedging with the next provider")
+            launch()
+            continue
+        for future in done:
+            provider = pending.pop(future)
+            try:
+                result = future.result()
+            except LLMError as e:
+                provider.breaker.record_failure()
+                errors.append(f"{e.message}: {e.details}")
+                continue
+            provider.breaker.record_success()
+            logger.info(f"{provider.name} response received successfully")
+            return result
+        if not pending and queue:
+            launch()
+    if deadline and deadline.remaining() <= 0:
+        raise DeadlineExceeded("generation")
+    raise LLMError("All LLM providers failed", errors)
@@ -0,0 +1,105 @@
+from django.core.management.base import BaseCommand, CommandError
+import os
+import shutil
+import tempfile
+import time
+
+BACKENDS = ('chroma', 'numpy', 'numpy-int8')
+
+
+def open_client(backend, path):
+    if backend == 'chroma':
+        from chromadb import PersistentClient
+        return PersistentClient(path=path)
+    from assistant.numpy_index import NumpyClient
+    return NumpyClient(path, dtype='int8' if backend == 'numpy-int8' else 'float32')
+
+
+def directory_size(path):
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the vector store backends on synthetic unit-length embeddings: build time, "
+        "cold open plus first query, query latency, recall against exact search, and disk size."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=5000)
+        parser.add_argument('--dim', type=int, default=384, help="Embedding size (384 for all-MiniLM-L6-v2).")
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--k', type=int, default=5, help="n_results per query.")
+        parser.add_argument('--batch-size', type=int, default=256)
+        parser.add_argument('--backend', action='append', dest='backends', choices=BACKENDS)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        import numpy as np
+
+        rng = np.random.default_rng(options['seed'])
+        vectors = rng.normal(size=(options['items'], options['dim'])).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        # Queries close to stored items, as real questions are to the passages that answer them
+        picks = rng.integers(0, options['items'], size=options['queries'])
+        queries = vectors[picks] + rng.normal(scale=0.05, size=(options['queries'], options['dim'])).astype(np.float32)
+        exact = np.argsort(
+            (queries ** 2).sum(axis=1)[:, None] + (vectors ** 2).sum(axis=1)[None, :] - 2 * queries @ vectors.T,
+            axis=1
+        )[:, :options['k']]
+        ids = [f"item_{index}" for index in range(options['items'])]
+        metadatas = [{"source_type": "pdf" if index % 2 else "web"} for index in range(options['items'])]
+
+        self.stdout.write(
+            f"{options['items']} items x {options['dim']} dims, {options['queries']} queries, k={options['k']}"
+        )
+        self.stdout.write(
+            f"{'backend':<12}{'build s':>10}{'open+1st ms':>13}{'p50 ms':>9}{'p95 ms':>9}{'recall':>8}{'disk MB':>9}"
+        )
+        for backend in options['backends'] or BACKENDS:
+            path = tempfile.mkdtemp(prefix=f"bench-{backend}-")
+            try:
+                self.stdout.write(self.run_backend(backend, path, ids, vectors, metadatas, queries, exact, options))
+            except ImportError as e:
+                self.stderr.write(f"{backend}: skipped ({e})")
+            finally:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def run_backend(self, backend, path, ids, vectors, metadatas, queries, exact, options):
+        import numpy as np
+
+        k = options['k']
+        started = time.perf_counter()
+        collection = open_client(backend, path).get_or_create_collection('bench')
+        for start in range(0, len(ids), options['batch_size']):
+            end = start + options['batch_size']
+            collection.upsert(ids=ids[start:end], embeddings=vectors[start:end].tolist(), metadatas=metadatas[start:end])
+        build = time.perf_counter() - started
+        del collection
+
+        # A fresh client is what a newly started worker pays before its first answer
+        started = time.perf_counter()
+        collection = open_client(backend, path).get_or_create_collection('bench')
+        collection.query(query_embeddings=[queries[0].tolist()], n_results=k, include=['distances'])
+        cold = (time.perf_counter() - started) * 1000
+
+        latencies = []
+        hits = 0
+        for query, expected in zip(queries, exact):
+            started = time.perf_counter()
+            result = collection.query(query_embeddings=[query.tolist()], n_results=k, include=['distances'])
+            latencies.append((time.perf_counter() - started) * 1000)
+            found = {int(vector_id.split('_')[1]) for vector_id in result['ids'][0]}
+            hits += len(found & set(expected.tolist()))
+        if len(result['ids'][0]) != k:
+            raise CommandError(f"{backend} returned {len(result['ids'][0])} results instead of {k}")
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2]
+        p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+        recall = hits / (k * len(queries))
+        disk = directory_size(path) / 1e6
+        return f"{backend:<12}{build:>10.2f}{cold:>13.1f}{p50:>9.2f}{p95:>9.2f}{recall:>8.3f}{disk:>9.1f}"
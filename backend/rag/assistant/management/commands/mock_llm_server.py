@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from assistant.mock_llm import MockLLMServer
+
+
+class Command(BaseCommand):
+    help = "Runs a local OpenAI-compatible chat completion server that answers without a real model."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8001)
+        parser.add_argument('--delay', type=float, default=0, help="Seconds to wait before every answer.")
+        parser.add_argument('--status', type=int, default=200, help="HTTP status to fail with instead of answering.")
+
+    def handle(self, *args, **options):
+        server = MockLLMServer((options['host'], options['port']), delay=options['delay'], status=options['status'])
+        self.stdout.write(f"Mock LLM listening on {server.base_url} (set LLM_BASE_URL or LLM_FALLBACK_BASE_URL to it)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
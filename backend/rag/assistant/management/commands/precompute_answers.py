@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from assistant.models import PrecomputedAnswer
+from assistant import answers
+from assistant import index_sync
+from assistant import llm
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates answers to frequent questions against the current index. Only new answers and "
+        "answers whose source items changed are regenerated unless --all is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', default=settings.DEFAULT_TENANT)
+        parser.add_argument('--question', action='append', dest='questions', default=[], help="Question to add (repeatable).")
+        parser.add_argument('--file', help="Text file with one curated question per line.")
+        parser.add_argument('--mine', type=int, default=0, metavar='N', help="Add the N most frequently asked questions.")
+        parser.add_argument('--min-count', type=int, default=2, help="Times a question must have been asked to be mined.")
+        parser.add_argument('--all', action='store_true', help="Regenerate every answer, not only stale ones.")
+
+    def handle(self, *args, **options):
+        tenant = options['tenant']
+        questions = list(options['questions'])
+        if options['file']:
+            try:
+                with open(options['file'], encoding='utf-8') as handle:
+                    questions += handle.read().splitlines()
+            except OSError as e:
+                raise CommandError(f"Cannot read {options['file']}: {e}")
+        if options['mine']:
+            mined = answers.frequent_questions(tenant, options['mine'], options['min_count'])
+            for question, asked in mined:
+                self.stdout.write(f"Mined ({asked}x): {question}")
+            questions += [question for question, _ in mined]
+        added = answers.add_questions(tenant, questions)
+        self.stdout.write(f"Added {added} new question(s)")
+
+        # Answer against an index that includes every committed change
+        index_sync.process_outbox()
+        if options['all']:
+            pending = list(PrecomputedAnswer.objects.filter(tenant=tenant).order_by('id'))
+        else:
+            pending = answers.needs_generation(tenant)
+
+        generated = failed = skipped = 0
+        for answer in pending:
+            try:
+                if answers.generate(answer) is None:
+                    skipped += 1
+                    continue
+            except llm.LLMError as e:
+                self.stderr.write(f"Failed to answer '{answer.question[:50]}': {e.message} {e.details or ''}")
+                failed += 1
+                continue
+            except Exception as e:
+                # Embedding, vector store and deadline errors only cost this question
+                self.stderr.write(f"Failed to answer '{answer.question[:50]}': {e}")
+                failed += 1
+                continue
+            generated += 1
+        fresh = PrecomputedAnswer.objects.filter(tenant=tenant, stale=False).count()
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {generated} answer(s), {failed} failed, {skipped} skipped as off-topic; {fresh} ready to serve for tenant {tenant}"
+        ))
@@ -0,0 +1,143 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from assistant.models import QueryLog
+from assistant import query_log
+
+SECTIONS = ('top', 'cache', 'stages', 'retrieval')
+STAGES = ('rewrite', 'embedding', 'precomputed', 'retrieval', 'generation')
+CACHE_SIZES = (10, 50, 100, 500)
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def normalize(query):
+    return ' '.join(query.lower().split())
+
+
+class Command(BaseCommand):
+    help = "Summarizes the query log: top queries, cache-hit potential, slow stages and retrieval depth."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', help="Only report on this tenant.")
+        parser.add_argument('--days', type=float, default=7, help="Look back this many days (default 7).")
+        parser.add_argument('--limit', type=int, default=10, help="Rows in the top-N listings.")
+        parser.add_argument(
+            '--section', action='append', dest='sections', choices=SECTIONS,
+            help="Only print this section (repeatable)."
+        )
+
+    def handle(self, *args, **options):
+        query_log.flush()
+        logs = QueryLog.objects.filter(created_at__gte=timezone.now() - timedelta(days=options['days']))
+        if options['tenant']:
+            logs = logs.filter(tenant=options['tenant'])
+        rows = list(logs.values(
+            'query', 'retrieval_query', 'embedding_hash', 'retrieved_ids', 'scores', 'precomputed', 'provider',
+            'prompt_tokens', 'completion_tokens', 'timings', 'total_ms', 'status'
+        ).iterator())
+        if not rows:
+            self.stdout.write("No queries logged in this window")
+            return
+        answered = [row for row in rows if row['status'] == 200]
+        errors = len(rows) - len(answered)
+        self.stdout.write(f"{len(rows)} queries in the last {options['days']:g} day(s), {errors} failed")
+        if not answered:
+            # Every section reports on answered queries only
+            self.stdout.write("No answered queries to report on")
+            return
+
+        for section in options['sections'] or SECTIONS:
+            self.stdout.write('')
+            getattr(self, f"report_{section}")(answered, options['limit'])
+
+    def report_top(self, rows, limit):
+        self.stdout.write(self.style.MIGRATE_HEADING("Top queries"))
+        counts = Counter(normalize(row['retrieval_query'] or row['query']) for row in rows)
+        for query, count in counts.most_common(limit):
+            self.stdout.write(f"{count:>7}  {100 * count / len(rows):5.1f}%  {query[:80]}")
+
+    def report_cache(self, rows, limit):
+        self.stdout.write(self.style.MIGRATE_HEADING("Cache-hit potential"))
+        total = len(rows)
+        texts = Counter(normalize(row['retrieval_query'] or row['query']) for row in rows)
+        hashes = Counter(row['embedding_hash'] for row in rows if row['embedding_hash'])
+        precomputed = sum(row['precomputed'] for row in rows)
+        # A query repeats when the same text (or embedding) was seen earlier in the window
+        self.stdout.write(f"Repeated query text:      {100 * (total - len(texts)) / total:5.1f}%")
+        if hashes:
+            embedded = sum(hashes.values())
+            self.stdout.write(f"Repeated query embedding: {100 * (embedded - len(hashes)) / embedded:5.1f}%")
+        self.stdout.write(f"Served precomputed:       {100 * precomputed / total:5.1f}%")
+        ranked = [count for _, count in texts.most_common()]
+        for size in CACHE_SIZES:
+            covered = sum(ranked[:size])
+            self.stdout.write(f"Top {size:<4} queries cover:   {100 * covered / total:5.1f}%")
+
+    def report_stages(self, rows, limit):
+        self.stdout.write(self.style.MIGRATE_HEADING("Stage timings (ms)"))
+        self.stdout.write(f"{'stage':<12}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}{'share':>8}")
+        total_ms = sum(row['total_ms'] for row in rows) or 1
+        durations = defaultdict(list)
+        for row in rows:
+            for stage, elapsed in row['timings'].items():
+                durations[stage].append(elapsed)
+        durations['total'] = [row['total_ms'] for row in rows]
+        for stage in STAGES + ('total',):
+            values = sorted(durations.get(stage, []))
+            if not values:
+                continue
+            self.stdout.write(
+                f"{stage:<12}{len(values):>8}{percentile(values, 0.5):>10.1f}{percentile(values, 0.95):>10.1f}"
+                f"{percentile(values, 0.99):>10.1f}{values[-1]:>10.1f}{100 * sum(values) / total_ms:>7.1f}%"
+            )
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Slowest {limit} queries"))
+        for row in sorted(rows, key=lambda row: row['total_ms'], reverse=True)[:limit]:
+            slowest = max(row['timings'].items(), key=lambda timing: timing[1], default=('-', 0))
+            self.stdout.write(
+                f"{row['total_ms']:>9.1f}ms  {slowest[0]} {slowest[1]:.1f}ms  {row['query'][:60]}"
+            )
+
+    def report_retrieval(self, rows, limit):
+        self.stdout.write(self.style.MIGRATE_HEADING("Retrieval depth"))
+        retrieved = [row for row in rows if not row['precomputed'] and row['scores']]
+        by_rank = defaultdict(list)
+        for row in retrieved:
+            for rank, distance in enumerate(row['scores'], start=1):
+                by_rank[rank].append(distance)
+        self.stdout.write(f"{'rank':<6}{'results':>9}{'mean distance':>16}{'p95 distance':>15}")
+        for rank in sorted(by_rank):
+            values = sorted(by_rank[rank])
+            self.stdout.write(
+                f"{rank:<6}{len(values):>9}{sum(values) / len(values):>16.4f}{percentile(values, 0.95):>15.4f}"
+            )
+        if retrieved:
+            # scores cover every candidate, retrieved_ids only those that passed RETRIEVAL_MAX_DISTANCE
+            depths = sorted(len(row['retrieved_ids']) for row in retrieved)
+            off_topic = sum(1 for depth in depths if not depth)
+            self.stdout.write(
+                f"Items used per query: mean {sum(depths) / len(depths):.1f}, p50 {percentile(depths, 0.5)}, "
+                f"max {depths[-1]}; off-topic {100 * off_topic / len(depths):.1f}%"
+            )
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Tokens per answer"))
+        tokens = defaultdict(lambda: [0, 0, 0])
+        for row in rows:
+            if row['prompt_tokens'] is None:
+                continue
+            totals = tokens[row['provider'] or '-']
+            totals[0] += 1
+            totals[1] += row['prompt_tokens']
+            totals[2] += row['completion_tokens'] or 0
+        for provider, (count, prompt, completion) in sorted(tokens.items()):
+            self.stdout.write(
+                f"{provider:<20}{count:>8} answers  prompt {prompt / count:>8.1f}  completion {completion / count:>8.1f}"
+            )
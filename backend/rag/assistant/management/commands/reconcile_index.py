@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from assistant.models import PortfolioItem
+from assistant import index_sync
+from assistant import vector_store
+
+
+class Command(BaseCommand):
+    help = "Drains the index outbox and repairs drift between PortfolioItem rows and the vector store."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', action='append', dest='tenants', help="Only reconcile this tenant (repeatable).")
+        parser.add_argument('--batch-size', type=int, default=settings.INDEX_SYNC_BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without writing to the vector store.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+
+        if not dry_run:
+            applied, failed = index_sync.process_outbox(batch_size=batch_size, retry_failed=True)
+            self.stdout.write(f"Outbox: {applied} applied, {failed} failed")
+
+        tenants = options['tenants']
+        if not tenants:
+            tenants = set(PortfolioItem.objects.values_list('tenant', flat=True).distinct())
+            tenants |= vector_store.list_tenants()
+
+        for tenant in sorted(tenants):
+            to_upsert, to_delete = index_sync.reconcile_tenant(tenant, batch_size=batch_size, dry_run=dry_run)
+            verb = "would upsert" if dry_run else "upserted"
+            self.stdout.write(
+                f"Tenant {tenant}: {verb} {len(to_upsert)} item(s), "
+                f"{'would delete' if dry_run else 'deleted'} {len(to_delete)} stale vector(s)"
+            )
+        self.stdout.write(self.style.SUCCESS("Index reconciliation complete"))
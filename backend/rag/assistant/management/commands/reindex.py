@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from assistant.models import PortfolioItem
+from assistant import reindex
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-embeds every PortfolioItem into a new versioned collection and switches queries to it "
+        "once complete. Queries keep using the current collection while the build runs; an "
+        "interrupted build resumes from its last checkpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', action='append', dest='tenants', help="Only reindex this tenant (repeatable).")
+        parser.add_argument('--model', default=settings.EMBEDDING_MODEL_NAME, help="Embedding model for the new collection.")
+        parser.add_argument('--batch-size', type=int, default=settings.INDEX_SYNC_BATCH_SIZE)
+        parser.add_argument('--no-activate', action='store_true', help="Build the collection but keep serving the current one.")
+        parser.add_argument('--drop-old', action='store_true', help="Delete the tenant's inactive collections after switching.")
+
+    def handle(self, *args, **options):
+        tenants = options['tenants'] or sorted(set(PortfolioItem.objects.values_list('tenant', flat=True).distinct()))
+        for tenant in tenants:
+            build = reindex.start_build(tenant, options['model'])
+            self.stdout.write(f"Building {build.collection_name} for tenant {tenant} ({build.model_name})")
+            try:
+                reindex.run_build(build, batch_size=options['batch_size'], report=self.report)
+                if options['no_activate']:
+                    self.stdout.write(f"Built {build.collection_name}; not activated")
+                    continue
+                reindex.activate(build, batch_size=options['batch_size'])
+            except Exception as e:
+                reindex.record_error(build, e)
+                raise CommandError(f"Reindex of tenant {tenant} stopped at item {build.last_item_id}: {str(e)}")
+            self.stdout.write(self.style.SUCCESS(f"Tenant {tenant} now served from {build.collection_name}"))
+            if options['drop_old']:
+                for name in reindex.drop_inactive_collections(tenant):
+                    self.stdout.write(f"Dropped collection {name}")
+
+    def report(self, build, rate, eta):
+        self.stdout.write(
+            f"  {build.items_indexed}/{build.items_total} items  {rate:.1f} items/s  ETA {eta:.0f}s"
+        )
@@ -0,0 +1,105 @@
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.core.exceptions import SuspiciousFileOperation
+from django.views.decorators.http import require_safe
+from urllib.parse import quote
+import mimetypes
+import os
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def parse_range(header, size):
+    """
+    Parses a single-range `Range` header.
+
+    Returns:
+        tuple: (start, end) inclusive, None to send the whole file (no or unsupported header),
+        or False when the range cannot be satisfied.
+    """
+    match = RANGE_PATTERN.match(header or '')
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if not start:
+        # Suffix range: the last `end` bytes
+        length = int(end)
+        return (max(size - length, 0), size - 1) if length and size else False
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def iter_range(file, start, length):
+    with file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve(request, path):
+    """
+    Serves an uploaded file with validators, 304s and byte ranges (PDF viewers fetch pages by range).
+
+    Full files go out through FileResponse, which WSGI servers send with sendfile(). With
+    settings.MEDIA_ACCEL_REDIRECT set, the transfer is handed to nginx with X-Accel-Redirect instead.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Invalid path")
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404(f"{path} does not exist")
+    if not os.path.isfile(full_path):
+        raise Http404(f"{path} does not exist")
+
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        response = build_response(request, path, full_path, stat.st_size, etag)
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=settings.HTTP_CACHE_MAX_AGE, must_revalidate=True)
+    return response
+
+
+def build_response(request, path, full_path, size, etag):
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    if settings.MEDIA_ACCEL_REDIRECT:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = f"{settings.MEDIA_ACCEL_REDIRECT.rstrip('/')}/{quote(path)}"
+        return response
+
+    # A stale If-Range means the client's partial copy is of another version: send everything
+    if_range = request.headers.get('If-Range')
+    byte_range = parse_range(request.headers.get('Range'), size) if if_range in (None, etag) else None
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f"bytes */{size}"
+        return response
+    if byte_range is None:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            iter_range(open(full_path, 'rb'), start, end - start + 1), status=206, content_type=content_type
+        )
+        response['Content-Range'] = f"bytes {start}-{end}/{size}"
+        response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    return response
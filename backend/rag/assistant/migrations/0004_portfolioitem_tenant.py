@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 09:12
+
+import assistant.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistant', '0003_alter_portfolioitem_content'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='portfolioitem',
+            name='tenant',
+            field=models.SlugField(default=assistant.models.default_tenant),
+        ),
+        migrations.AddIndex(
+            model_name='portfolioitem',
+            index=models.Index(fields=['tenant', 'source_type'], name='assistant_p_tenant_f9910d_idx'),
+        ),
+    ]
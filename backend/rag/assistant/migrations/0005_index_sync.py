@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:02
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def backfill_index_fields(apps, schema_editor):
+    PortfolioItem = apps.get_model('assistant', 'PortfolioItem')
+    for item in PortfolioItem.objects.all().iterator():
+        item.content_hash = hashlib.sha256(item.content.encode('utf-8')).hexdigest() if item.content else ''
+        item.vector_id = item.vector_id or f"item_{item.pk}"
+        item.save(update_fields=['content_hash', 'vector_id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistant', '0004_portfolioitem_tenant'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='portfolioitem',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.CreateModel(
+            name='IndexOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_id', models.BigIntegerField()),
+                ('vector_id', models.CharField(max_length=100)),
+                ('tenant', models.SlugField()),
+                ('operation', models.CharField(choices=[('upsert', 'Upsert'), ('delete', 'Delete')], max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('tenant', 'vector_id'), name='unique_outbox_vector')],
+            },
+        ),
+        migrations.RunPython(backfill_index_fields, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-19 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistant', '0005_index_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexBuild',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tenant', models.SlugField()),
+                ('collection_name', models.CharField(blank=True, max_length=63)),
+                ('model_name', models.CharField(max_length=200)),
+                ('status', models.CharField(choices=[('building', 'Building'), ('active', 'Active'), ('retired', 'Retired')], default='building', max_length=10)),
+                ('last_item_id', models.BigIntegerField(default=0)),
+                ('items_indexed', models.PositiveIntegerField(default=0)),
+                ('items_total', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('activated_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tenant', 'status'], name='assistant_i_tenant_63959f_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status', 'active')), fields=('tenant',), name='one_active_build_per_tenant')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:40
+
+from django.db import migrations
+
+from assistant import search
+
+
+def install(apps, schema_editor):
+    search.install_fulltext_index(schema_editor)
+
+
+def remove(apps, schema_editor):
+    search.remove_fulltext_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistant', '0006_indexbuild'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, remove),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.5 on 2026-10-19 13:30
+
+import assistant.models
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistant', '0007_portfolioitem_fulltext'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('tenant', models.SlugField(default=assistant.models.default_tenant)),
+                ('summary', models.TextField(blank=True, default='')),
+                ('summarized_turns', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ConversationTurn',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.TextField()),
+                ('standalone_query', models.TextField()),
+                ('response', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='turns', to='assistant.conversation')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
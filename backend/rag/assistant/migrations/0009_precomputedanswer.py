@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:10
+
+import assistant.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistant', '0008_conversation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrecomputedAnswer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tenant', models.SlugField(default=assistant.models.default_tenant)),
+                ('question', models.TextField()),
+                ('response', models.TextField(blank=True, default='')),
+                ('question_embedding', models.JSONField(blank=True, editable=False, null=True)),
+                ('model_name', models.CharField(blank=True, default='', editable=False, max_length=255)),
+                ('sources', models.JSONField(blank=True, default=dict, editable=False)),
+                ('stale', models.BooleanField(db_index=True, default=True)),
+                ('generated_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('tenant', 'question'), name='unique_precomputed_question')],
+            },
+        ),
+    ]
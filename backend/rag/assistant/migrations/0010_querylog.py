@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:40
+
+import assistant.models
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistant', '0009_precomputedanswer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueryLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('endpoint', models.CharField(choices=[('query', 'Query'), ('conversation', 'Conversation')], default='query', max_length=20)),
+                ('tenant', models.SlugField(default=assistant.models.default_tenant)),
+                ('query', models.TextField()),
+                ('retrieval_query', models.TextField(blank=True, default='')),
+                ('embedding_hash', models.CharField(blank=True, db_index=True, default='', max_length=64)),
+                ('retrieved_ids', models.JSONField(default=list)),
+                ('scores', models.JSONField(default=list)),
+                ('precomputed', models.BooleanField(default=False)),
+                ('provider', models.CharField(blank=True, default='', max_length=100)),
+                ('prompt_tokens', models.PositiveIntegerField(blank=True, null=True)),
+                ('completion_tokens', models.PositiveIntegerField(blank=True, null=True)),
+                ('timings', models.JSONField(default=dict)),
+                ('total_ms', models.FloatField(default=0)),
+                ('status', models.PositiveSmallIntegerField(default=200)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tenant', 'created_at'], name='assistant_q_tenant_a1cb18_idx')],
+            },
+        ),
+    ]
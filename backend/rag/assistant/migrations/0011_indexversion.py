@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-19 15:20
+
+from django.db import migrations, models
+
+
+def create_counter(apps, schema_editor):
+    apps.get_model('assistant', 'IndexVersion').objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistant', '0010_querylog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_counter, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class MockChatHandler(BaseHTTPRequestHandler):
+    """Answers `POST .../chat/completions` in the OpenAI format, echoing the last message."""
+
+    def do_POST(self):
+        server = self.server
+        server.requests += 1
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            return self.reply(404, {"error": f"Unknown path {self.path}"})
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if server.delay:
+            time.sleep(server.delay)
+        if server.status != 200:
+            return self.reply(server.status, {"error": "Mock failure"})
+        messages = body.get('messages') or [{"content": ""}]
+        content = server.response or f"Mock answer to: {messages[-1]['content'][:200]}"
+        self.reply(200, {
+            "id": f"mock-{server.requests}",
+            "object": "chat.completion",
+            "model": body.get('model', 'mock'),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+    def reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client gave up (timeout or a hedged request won)
+
+    def log_message(self, format, *args):
+        logger.debug(f"Mock LLM: {format % args}")
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, delay=0, status=200, response=None):
+        super().__init__(address, MockChatHandler)
+        self.delay = delay
+        self.status = status
+        self.response = response
+        self.requests = 0
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+def start_server(host='127.0.0.1', port=0, **behaviour):
+    """Starts a mock server on a background thread; port 0 picks a free port. Call `shutdown()` to stop it."""
+    server = MockLLMServer((host, port), **behaviour)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -1,15 +1,20 @@
-from django.db import models
-import json
-from sentence_transformers import SentenceTransformer
-import PyPDF2
-import requests
-from bs4 import BeautifulSoup
+from django.db import models, transaction
 from django.conf import settings
+from django.utils import timezone
 import os
+import hashlib
+import uuid
 import logging
+from . import extraction
 
 logger = logging.getLogger(__name__)
 
+
+def default_tenant():
+    """A callable rather than the value itself, so the migrations don't depend on DEFAULT_TENANT."""
+    return settings.DEFAULT_TENANT
+
+
 class PortfolioItem(models.Model):
     SOURCE_TYPE_CHOICES = (
         ('pdf', 'PDF Document'),
@@ -25,6 +30,8 @@ class PortfolioItem(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     metadata = models.JSONField(default=dict, blank=True)
+    tenant = models.SlugField(max_length=50, default=default_tenant)
+    content_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
 
     def extract_pdf_content(self, pdf_path):
         try:
@@ -32,19 +39,12 @@ class PortfolioItem(models.Model):
             if not os.path.exists(pdf_path):
                 logger.error(f"File does not exist: {pdf_path}")
                 raise FileNotFoundError(f"File does not exist: {pdf_path}")
-            with open(pdf_path, 'rb') as file:
-                reader = PyPDF2.PdfReader(file)
-                content = ""
-                for page in reader.pages:
-                    text = page.extract_text()
-                    if text:
-                        content += text
-                content = content.strip()
-                if not content:
-                    logger.warning(f"No text extracted from PDF: {pdf_path}")
-                    content = "No extractable text in PDF"
-                logger.info(f"Extracted content (length={len(content)}): {content[:100]}...")
-                return content
+            content = extraction.extract_pdf_text(pdf_path)
+            if not content:
+                logger.warning(f"No text extracted from PDF: {pdf_path}")
+                content = "No extractable text in PDF"
+            logger.info(f"Extracted content (length={len(content)}): {content[:100]}...")
+            return content
         except Exception as e:
             logger.error(f"PDF extraction failed for {pdf_path}: {str(e)}")
             raise
@@ -52,11 +52,7 @@ class PortfolioItem(models.Model):
     def extract_web_content(self, url):
         try:
             logger.info(f"Scraping web content from: {url}")
-            response = requests.get(url, timeout=10)
-            soup = BeautifulSoup(response.text, 'html.parser')
-            for script in soup(["script", "style"]):
-                script.decompose()
-            content = ' '.join(soup.stripped_strings).strip()
+            content = extraction.scrape_web_text(url)
             if not content:
                 logger.warning(f"No content scraped from URL: {url}")
                 content = "No extractable content from URL"
@@ -82,47 +78,25 @@ class PortfolioItem(models.Model):
                 logger.error(f"Content extraction failed: {str(e)}")
                 self.content = f"Error extracting content: {str(e)}"
 
-        super().save(*args, **kwargs)  # Save to Django database to get an ID
-
-        if not self.id:
-            logger.error("No ID assigned after saving to database")
-            raise ValueError("No ID assigned after saving to database")
+        self.content_hash = hashlib.sha256(self.content.encode('utf-8')).hexdigest() if self.content else ''
 
-        if self.content and not self.vector_id:
-            try:
-                global _cached_st_model
-                if '_cached_st_model' not in globals() or _cached_st_model is None:
-                    logger.info("Initializing SentenceTransformer model: all-MiniLM-L6-v2")
-                    _cached_st_model = SentenceTransformer('all-MiniLM-L6-v2')
-                logger.info(f"Generating embedding for content (length={len(self.content)})")
-                embedding = _cached_st_model.encode(self.content).tolist()
-                from chromadb import PersistentClient
-                client = PersistentClient(path=str(settings.CHROMA_DB_PATH))  # Convert to string
-                logger.info("Creating or accessing portfolio collection")
-                collection = client.get_or_create_collection("portfolio")
+        # The vector itself is written by the index sync outbox (see signals.py) after commit,
+        # so a failing vector store never rolls back or corrupts the database row.
+        with transaction.atomic():
+            super().save(*args, **kwargs)  # Save to Django database to get an ID
+            if not self.id:
+                logger.error("No ID assigned after saving to database")
+                raise ValueError("No ID assigned after saving to database")
+            if not self.vector_id:
                 self.vector_id = f"item_{self.id}"  # Ensure consistent vector_id
-                metadata_json = json.dumps(self.metadata) if self.metadata else "{}"
-                logger.info(f"Upserting item {self.vector_id} to ChromaDB")
-                collection.upsert(
-                    ids=[self.vector_id],
-                    embeddings=[embedding],
-                    metadatas=[{
-                        "title": self.title or "",
-                        "content": self.content[:1000],
-                        "source_type": self.source_type,
-                        "source_url": self.source_url or "",
-                        "metadata": metadata_json
-                    }],
-                    documents=[self.content]
-                )
-                logger.info(f"Successfully upserted item {self.vector_id}")
-                super().save(*args, **kwargs)  # Save again to update vector_id
-            except Exception as e:
-                logger.error(f"ChromaDB upsert failed: {str(e)}")
-                self.content = f"ChromaDB upsert failed: {str(e)}"
-                super().save(*args, **kwargs)  # Save error message
-        else:
-            logger.info(f"Skipping ChromaDB upsert for item {self.id}: content={bool(self.content)}, vector_id={self.vector_id}")
+                PortfolioItem.objects.filter(pk=self.pk).update(vector_id=self.vector_id)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember which tenant collection currently holds the vector so a tenant change can be cleaned up
+        instance._loaded_tenant = instance.__dict__.get('tenant')
+        return instance
 
     def __str__(self):
         return f"{self.source_type}: {self.title or self.id}"
@@ -131,4 +105,167 @@ class PortfolioItem(models.Model):
         indexes = [
             models.Index(fields=['source_type']),
             models.Index(fields=['created_at']),
-        ]
\ No newline at end of file
+            models.Index(fields=['tenant', 'source_type']),
+        ]
+
+class IndexOutbox(models.Model):
+    """Pending vector store write for a PortfolioItem, recorded in the same transaction as the row change."""
+    OPERATION_UPSERT = 'upsert'
+    OPERATION_DELETE = 'delete'
+    OPERATION_CHOICES = (
+        (OPERATION_UPSERT, 'Upsert'),
+        (OPERATION_DELETE, 'Delete'),
+    )
+
+    item_id = models.BigIntegerField()
+    vector_id = models.CharField(max_length=100)
+    tenant = models.SlugField(max_length=50)
+    operation = models.CharField(max_length=10, choices=OPERATION_CHOICES)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.operation} {self.vector_id} ({self.tenant})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tenant', 'vector_id'], name='unique_outbox_vector'),
+        ]
+
+
+class IndexVersion(models.Model):
+    """Single-row counter bumped on every PortfolioItem change; HTTP validators are derived from it."""
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"v{self.version}"
+
+
+class IndexBuild(models.Model):
+    """A versioned Chroma collection built by `manage.py reindex`; exactly one build per tenant is active."""
+    STATUS_BUILDING = 'building'
+    STATUS_ACTIVE = 'active'
+    STATUS_RETIRED = 'retired'
+    STATUS_CHOICES = (
+        (STATUS_BUILDING, 'Building'),
+        (STATUS_ACTIVE, 'Active'),
+        (STATUS_RETIRED, 'Retired'),
+    )
+
+    tenant = models.SlugField(max_length=50)
+    collection_name = models.CharField(max_length=63, blank=True)
+    model_name = models.CharField(max_length=200)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_BUILDING)
+    last_item_id = models.BigIntegerField(default=0)  # Resume checkpoint: items are streamed in pk order
+    items_indexed = models.PositiveIntegerField(default=0)
+    items_total = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default='')  # Last error of an interrupted run
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    activated_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.collection_name or self.tenant} ({self.status})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['tenant', 'status']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tenant'],
+                condition=models.Q(status='active'),
+                name='one_active_build_per_tenant'
+            ),
+        ]
+
+
+class Conversation(models.Model):
+    """A multi-turn session; older turns are folded into `summary` so prompts stay a constant size."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    tenant = models.SlugField(max_length=50, default=default_tenant)
+    summary = models.TextField(blank=True, default='')
+    summarized_turns = models.PositiveIntegerField(default=0)  # Oldest turns already covered by `summary`
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Conversation {self.id} ({self.tenant})"
+
+
+class ConversationTurn(models.Model):
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='turns')
+    query = models.TextField()
+    standalone_query = models.TextField()  # Follow-up rewritten with its history, used for retrieval
+    response = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.query[:50]
+
+    class Meta:
+        ordering = ['id']
+
+
+class PrecomputedAnswer(models.Model):
+    """
+    An answer to a frequent question generated ahead of time and served on a close enough match.
+
+    `sources` maps the ids of the items the answer was generated from to their content hash, so
+    the answer goes stale (and is regenerated) only when one of those items changes.
+    """
+    tenant = models.SlugField(max_length=50, default=default_tenant)
+    question = models.TextField()
+    response = models.TextField(blank=True, default='')
+    question_embedding = models.JSONField(null=True, blank=True, editable=False)
+    model_name = models.CharField(max_length=255, blank=True, default='', editable=False)  # Embedding model
+    sources = models.JSONField(default=dict, blank=True, editable=False)
+    stale = models.BooleanField(default=True, db_index=True)
+    generated_at = models.DateTimeField(null=True, blank=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.question[:50]
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tenant', 'question'], name='unique_precomputed_question'),
+        ]
+
+
+class QueryLog(models.Model):
+    """One answered (or failed) query, written in batches by assistant.query_log for offline analysis."""
+    ENDPOINT_QUERY = 'query'
+    ENDPOINT_CONVERSATION = 'conversation'
+    ENDPOINT_CHOICES = [
+        (ENDPOINT_QUERY, 'Query'),
+        (ENDPOINT_CONVERSATION, 'Conversation'),
+    ]
+
+    endpoint = models.CharField(max_length=20, choices=ENDPOINT_CHOICES, default=ENDPOINT_QUERY)
+    tenant = models.SlugField(max_length=50, default=default_tenant)
+    query = models.TextField()
+    retrieval_query = models.TextField(blank=True, default='')  # Standalone rewrite of a follow-up
+    embedding_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)
+    retrieved_ids = models.JSONField(default=list)
+    scores = models.JSONField(default=list)  # Distance per retrieval candidate (kept or cut off), or the precomputed match similarity
+    precomputed = models.BooleanField(default=False)
+    provider = models.CharField(max_length=100, blank=True, default='')
+    prompt_tokens = models.PositiveIntegerField(null=True, blank=True)
+    completion_tokens = models.PositiveIntegerField(null=True, blank=True)
+    timings = models.JSONField(default=dict)  # Milliseconds per stage
+    total_ms = models.FloatField(default=0)
+    status = models.PositiveSmallIntegerField(default=200)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return self.query[:50]
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['tenant', 'created_at']),
+        ]
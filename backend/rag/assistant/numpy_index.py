@@ -0,0 +1,324 @@
+"""
+A small vector store for portfolio-sized corpora: one memory-mapped `.npy` matrix per collection.
+
+Implements the part of the Chroma client and collection API that vector_store relies on, so it
+can be swapped in with VECTOR_STORE_BACKEND=numpy. Layout of a collection directory:
+
+    meta.json               ids (None marks a tombstone), metadatas, dimension, row count, generation
+    vectors.<gen>.npy       (capacity, dim) float32 or int8 rows; rows past `count` are unused
+    scales.<gen>.npy        per-row dequantization scale (int8 only)
+    norms.<gen>.npy         squared L2 norm of every original row, for Chroma-compatible distances
+
+Writes append rows in place and mark replaced or deleted rows as tombstones; when the matrix is
+full or too many rows are dead, live rows are compacted into the next generation of files. Every
+process maps the same files read-only, so workers share one copy in the page cache, and picks up
+changes when meta.json is replaced.
+
+Documents are not stored: item content lives in the database, which retrieval reads anyway.
+"""
+from collections import namedtuple
+from contextlib import contextmanager
+import json
+import os
+import shutil
+import threading
+import logging
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within a process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MIN_CAPACITY = 64
+
+
+def matches(metadata, where):
+    """Evaluates the Chroma `where` subset produced by vector_store.build_where()."""
+    for key, condition in where.items():
+        if key == '$and':
+            if not all(matches(metadata, clause) for clause in condition):
+                return False
+        elif key == '$or':
+            if not any(matches(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for operator, operand in condition.items():
+                if operator == '$eq' and value != operand:
+                    return False
+                if operator == '$ne' and value == operand:
+                    return False
+                if operator == '$in' and value not in operand:
+                    return False
+                if operator == '$nin' and value in operand:
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+def quantize(rows):
+    """Symmetric per-row int8 quantization; returns (int8 rows, float32 scales)."""
+    scales = np.abs(rows).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    return np.round(rows / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+# An immutable view of a collection; replaced as a whole so readers never see a half-applied write
+State = namedtuple('State', ['meta', 'rows', 'live', 'vectors', 'norms', 'scales'])
+
+
+class NumpyCollection:
+    def __init__(self, path, name, dtype='float32', compact_ratio=0.25):
+        self.path = path
+        self.name = name
+        self.compact_ratio = compact_ratio
+        self._lock = threading.Lock()
+        self._stamp = None
+        meta = {'dim': None, 'dtype': dtype, 'count': 0, 'capacity': 0, 'generation': 0, 'ids': [], 'metadatas': []}
+        self.state = State(meta, {}, np.zeros(0, dtype=bool), None, None, None)
+        os.makedirs(path, exist_ok=True)
+        self._refresh()
+
+    def _file(self, kind, generation):
+        return os.path.join(self.path, f"{kind}.{generation}.npy")
+
+    def _refresh(self):
+        """Returns the current state, reloading it if meta.json was replaced by any process."""
+        meta_path = os.path.join(self.path, 'meta.json')
+        for _ in range(3):
+            try:
+                stat = os.stat(meta_path)
+            except FileNotFoundError:
+                return self.state
+            stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            if stamp == self._stamp:
+                return self.state
+            try:
+                with open(meta_path, encoding='utf-8') as handle:
+                    meta = json.load(handle)
+                mapped = {}
+                if meta['capacity']:
+                    kinds = ('vectors', 'norms', 'scales') if meta['dtype'] == 'int8' else ('vectors', 'norms')
+                    for kind in kinds:
+                        mapped[kind] = np.load(self._file(kind, meta['generation']), mmap_mode='r')
+            except FileNotFoundError:
+                continue  # A compaction replaced the generation between reading meta.json and mapping it
+            self.state = State(
+                meta,
+                {vector_id: row for row, vector_id in enumerate(meta['ids']) if vector_id is not None},
+                np.fromiter((vector_id is not None for vector_id in meta['ids']), dtype=bool, count=meta['count']),
+                mapped.get('vectors'),
+                mapped.get('norms'),
+                mapped.get('scales')
+            )
+            self._stamp = stamp
+            return self.state
+        raise RuntimeError(f"Collection {self.name} kept changing while it was being loaded")
+
+    def _publish(self, meta):
+        # Replaced atomically: readers see either the old or the new state, never a partial file
+        temp = os.path.join(self.path, '.meta.json.tmp')
+        with open(temp, 'w', encoding='utf-8') as handle:
+            json.dump(meta, handle)
+        os.replace(temp, os.path.join(self.path, 'meta.json'))
+        self._stamp = None
+        return self._refresh()
+
+    @contextmanager
+    def _writing(self):
+        """Serializes writers across threads and processes and yields a private copy of the latest meta."""
+        with self._lock, open(os.path.join(self.path, 'lock'), 'a+') as handle:
+            if fcntl:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                meta = self._refresh().meta
+                yield dict(meta, ids=list(meta['ids']), metadatas=list(meta['metadatas']))
+            finally:
+                if fcntl:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _rewrite(self, meta, capacity):
+        """Copies the live rows into a new generation of files sized for `capacity` rows and publishes it."""
+        state = self.state
+        keep = [row for row, vector_id in enumerate(meta['ids']) if vector_id is not None]
+        old_generation = meta['generation']
+        generation = old_generation + 1
+        files = {
+            'vectors': ((capacity, meta['dim']), np.int8 if meta['dtype'] == 'int8' else np.float32),
+            'norms': ((capacity,), np.float32),
+        }
+        if meta['dtype'] == 'int8':
+            files['scales'] = ((capacity,), np.float32)
+        for kind, (shape, dtype) in files.items():
+            target = np.lib.format.open_memmap(self._file(kind, generation), mode='w+', dtype=dtype, shape=shape)
+            source = getattr(state, kind)
+            if keep and source is not None:
+                target[:len(keep)] = source[keep]
+            target.flush()
+            del target
+        meta.update(
+            generation=generation,
+            capacity=capacity,
+            count=len(keep),
+            ids=[meta['ids'][row] for row in keep],
+            metadatas=[meta['metadatas'][row] for row in keep],
+        )
+        self._publish(meta)
+        # Readers still mapping the old generation keep working: unlinked files live until unmapped
+        for kind in files:
+            try:
+                os.remove(self._file(kind, old_generation))
+            except OSError:
+                pass  # Not created yet, or still mapped on Windows; harmless leftovers
+        logger.info(f"Compacted {self.name} to generation {generation}: {len(keep)} rows, capacity {capacity}")
+
+    def _compact(self, meta, force=False):
+        count = meta['count']
+        dead = sum(vector_id is None for vector_id in meta['ids'])
+        if count and (force or dead > self.compact_ratio * count):
+            self._rewrite(meta, max(MIN_CAPACITY, 2 * (count - dead)))
+
+    # -- Chroma collection API -------------------------------------------------------------
+
+    def count(self):
+        return len(self._refresh().rows)
+
+    def upsert(self, ids, embeddings, metadatas=None, documents=None):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        metadatas = metadatas or [{} for _ in ids]
+        with self._writing() as meta:
+            if meta['dim'] is None:
+                meta['dim'] = int(embeddings.shape[1])
+            elif embeddings.shape[1] != meta['dim']:
+                raise ValueError(f"Embedding dimension {embeddings.shape[1]} does not match collection dimension {meta['dim']}")
+            rows = self.state.rows
+            for vector_id in ids:
+                if vector_id in rows:
+                    # Tombstone the previous version; the new one is appended
+                    meta['ids'][rows[vector_id]] = None
+                    meta['metadatas'][rows[vector_id]] = None
+            if meta['count'] + len(ids) > meta['capacity']:
+                live = sum(vector_id is not None for vector_id in meta['ids'])
+                self._rewrite(meta, max(MIN_CAPACITY, 2 * (live + len(ids))))
+
+            start, end = meta['count'], meta['count'] + len(ids)
+            vectors = np.load(self._file('vectors', meta['generation']), mmap_mode='r+')
+            norms = np.load(self._file('norms', meta['generation']), mmap_mode='r+')
+            if meta['dtype'] == 'int8':
+                scales = np.load(self._file('scales', meta['generation']), mmap_mode='r+')
+                vectors[start:end], scales[start:end] = quantize(embeddings)
+                scales.flush()
+            else:
+                vectors[start:end] = embeddings
+            norms[start:end] = np.einsum('ij,ij->i', embeddings, embeddings)
+            vectors.flush()
+            norms.flush()
+            del vectors, norms
+
+            # Rows are on disk before meta.json counts them, so a crash in between only leaks space
+            meta['ids'].extend(ids)
+            meta['metadatas'].extend(metadatas)
+            meta['count'] = end
+            self._publish(meta)
+            self._compact(meta)
+
+    def delete(self, ids=None):
+        with self._writing() as meta:
+            rows = self.state.rows
+            deleted = [rows[vector_id] for vector_id in ids or [] if vector_id in rows]
+            for row in deleted:
+                meta['ids'][row] = None
+                meta['metadatas'][row] = None
+            if deleted:
+                self._publish(meta)
+                self._compact(meta)
+
+    def compact(self):
+        """Drops tombstoned rows now instead of waiting for the dead-row ratio to be exceeded."""
+        with self._writing() as meta:
+            self._compact(meta, force=True)
+
+    def query(self, query_embeddings, n_results=10, where=None, include=('metadatas', 'documents', 'distances')):
+        state = self._refresh()
+        mask = state.live
+        if where:
+            mask = mask & np.fromiter(
+                (metadata is not None and matches(metadata, where) for metadata in state.meta['metadatas']),
+                dtype=bool, count=state.meta['count']
+            )
+        candidates = np.flatnonzero(mask)
+        result = {'ids': [], 'distances': [], 'metadatas': [], 'documents': []}
+        for query in np.asarray(query_embeddings, dtype=np.float32):
+            rows, distances = self._nearest(state, query, candidates, n_results)
+            result['ids'].append([state.meta['ids'][row] for row in rows])
+            result['distances'].append([float(distance) for distance in distances])
+            result['metadatas'].append([state.meta['metadatas'][row] for row in rows])
+            result['documents'].append([None] * len(rows))
+        return {key: value for key, value in result.items() if key == 'ids' or key in include}
+
+    def _nearest(self, state, query, candidates, n_results):
+        k = min(n_results, len(candidates))
+        if not k:
+            return candidates[:0], []
+        count = state.meta['count']
+        # One vectorized pass over the mapped matrix; int8 rows are rescaled after the dot product
+        scores = state.vectors[:count] @ query
+        if state.scales is not None:
+            scores = scores * state.scales[:count]
+        # Squared L2 like Chroma's default space: |q|^2 + |x|^2 - 2 q.x
+        distances = np.maximum(float(query @ query) + state.norms[candidates] - 2 * scores[candidates], 0)
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest])]
+        return candidates[nearest], distances[nearest]
+
+    def get(self, ids=None, include=('metadatas', 'documents'), limit=None, offset=None):
+        state = self._refresh()
+        if ids is not None:
+            rows = [state.rows[vector_id] for vector_id in ids if vector_id in state.rows]
+        else:
+            rows = [int(row) for row in np.flatnonzero(state.live)]
+            start = offset or 0
+            rows = rows[start:start + limit] if limit is not None else rows[start:]
+        result = {
+            'ids': [state.meta['ids'][row] for row in rows],
+            'metadatas': [state.meta['metadatas'][row] for row in rows],
+            'documents': [None] * len(rows),
+        }
+        return {key: value for key, value in result.items() if key == 'ids' or key in include}
+
+
+class NumpyClient:
+    """Chroma-client-shaped entry point: one subdirectory per collection under `path`."""
+
+    def __init__(self, path, dtype='float32', compact_ratio=0.25):
+        self.path = str(path)
+        self.dtype = dtype
+        self.compact_ratio = compact_ratio
+        self._collections = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+
+    def get_or_create_collection(self, name):
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = NumpyCollection(
+                    os.path.join(self.path, name), name, self.dtype, self.compact_ratio
+                )
+            return self._collections[name]
+
+    def list_collections(self):
+        return [
+            self.get_or_create_collection(name)
+            for name in sorted(os.listdir(self.path))
+            if os.path.isdir(os.path.join(self.path, name))
+        ]
+
+    def delete_collection(self, name):
+        with self._lock:
+            self._collections.pop(name, None)
+        shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
@@ -0,0 +1,95 @@
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import connections
+import atexit
+import hashlib
+import struct
+import threading
+import time
+import logging
+
+from .models import QueryLog
+
+logger = logging.getLogger(__name__)
+
+# Entries wait here until QUERY_LOG_BATCH_SIZE of them are buffered or QUERY_LOG_FLUSH_INTERVAL
+# seconds have passed, then go to the database in one bulk insert. A full batch is written by the
+# request that filled it, a partial one by the timer thread. A crash loses at most one batch.
+_buffer = []
+_buffer_lock = threading.Lock()
+_timer = None
+
+
+class StageTimer:
+    """Collects the wall-clock milliseconds spent in each stage of a request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    def total(self):
+        return round((time.perf_counter() - self.started) * 1000, 1)
+
+
+def embedding_hash(embedding):
+    """Identifies repeated queries; values are rounded so float noise between runs does not matter."""
+    values = [round(float(value), 4) for value in embedding]
+    return hashlib.sha256(struct.pack(f'{len(values)}f', *values)).hexdigest()
+
+
+def record(entry, timer, status):
+    """Completes an unsaved QueryLog with the outcome of its request and queues it for writing."""
+    global _timer
+    if not settings.QUERY_LOG_ENABLED:
+        return
+    entry.status = status
+    entry.timings = timer.timings
+    entry.total_ms = timer.total()
+    with _buffer_lock:
+        _buffer.append(entry)
+        full = len(_buffer) >= settings.QUERY_LOG_BATCH_SIZE
+        if not full and _timer is None:
+            _timer = threading.Timer(settings.QUERY_LOG_FLUSH_INTERVAL, _flush_from_timer)
+            _timer.daemon = True
+            _timer.start()
+    if full:
+        flush()
+
+
+def flush():
+    """Writes every buffered entry; returns how many were written."""
+    global _timer
+    with _buffer_lock:
+        entries = _buffer[:]
+        _buffer.clear()
+        if _timer is not None:
+            _timer.cancel()
+            _timer = None
+    if not entries:
+        return 0
+    try:
+        QueryLog.objects.bulk_create(entries)
+    except Exception as e:
+        # Analytics must never fail a request
+        logger.error(f"Failed to write {len(entries)} query log entries: {str(e)}", exc_info=True)
+        return 0
+    logger.debug(f"Wrote {len(entries)} query log entries")
+    return len(entries)
+
+
+def _flush_from_timer():
+    try:
+        flush()
+    finally:
+        connections.close_all()  # Only closes this thread's connections
+
+
+atexit.register(flush)
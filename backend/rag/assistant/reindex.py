@@ -0,0 +1,116 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+import time
+import logging
+
+from .models import PortfolioItem, IndexBuild
+from . import index_sync
+from . import vector_store
+
+logger = logging.getLogger(__name__)
+
+
+def start_build(tenant, model_name):
+    """Resumes the tenant's unfinished build for this model, or starts a new versioned collection."""
+    build = (
+        IndexBuild.objects.filter(tenant=tenant, model_name=model_name, status=IndexBuild.STATUS_BUILDING)
+        .order_by('-id')
+        .first()
+    )
+    if build:
+        logger.info(f"Resuming build {build.collection_name} after item {build.last_item_id}")
+        return build
+    build = IndexBuild.objects.create(tenant=tenant, model_name=model_name)
+    build.collection_name = vector_store.versioned_collection_name(tenant, build.id)
+    build.save(update_fields=['collection_name'])
+    logger.info(f"Starting build {build.collection_name} with model {model_name}")
+    return build
+
+
+def target_for(build):
+    return vector_store.IndexTarget(build.collection_name, build.model_name)
+
+
+def run_build(build, batch_size=None, report=None):
+    """
+    Streams the tenant's items into the build's collection, checkpointing after every batch.
+
+    Args:
+        build: The IndexBuild to fill; a crashed run is resumed from `last_item_id`.
+        batch_size: Items embedded and upserted per batch.
+        report: Optional callable(build, rate, eta_seconds) invoked after each batch.
+    """
+    batch_size = batch_size or settings.INDEX_SYNC_BATCH_SIZE
+    target = target_for(build)
+    items = (
+        PortfolioItem.objects.filter(tenant=build.tenant)
+        .exclude(content__isnull=True)
+        .exclude(content='')
+        .order_by('pk')
+    )
+    build.items_total = items.count()
+    build.save(update_fields=['items_total', 'updated_at'])
+
+    started = time.monotonic()
+    indexed_this_run = 0
+    while True:
+        item_ids = list(items.filter(pk__gt=build.last_item_id).values_list('pk', flat=True)[:batch_size])
+        if not item_ids:
+            break
+        index_sync.upsert_items(build.tenant, item_ids, target)
+        build.last_item_id = item_ids[-1]
+        build.items_indexed += len(item_ids)
+        build.save(update_fields=['last_item_id', 'items_indexed', 'updated_at'])
+
+        indexed_this_run += len(item_ids)
+        rate = indexed_this_run / max(time.monotonic() - started, 1e-6)
+        remaining = max(build.items_total - build.items_indexed, 0)
+        eta = remaining / rate
+        logger.info(
+            f"Build {build.collection_name}: {build.items_indexed}/{build.items_total} items, "
+            f"{rate:.1f} items/s, ETA {eta:.0f}s"
+        )
+        if report:
+            report(build, rate, eta)
+
+
+def activate(build, batch_size=None):
+    """
+    Switches the tenant's reads and writes to the build's collection.
+
+    Items changed while the build was running are caught up before the switch, and once
+    more afterwards for writes that still landed in the previous collection.
+    """
+    target = target_for(build)
+    index_sync.reconcile_tenant(build.tenant, batch_size=batch_size, target=target)
+    with transaction.atomic():
+        IndexBuild.objects.filter(tenant=build.tenant, status=IndexBuild.STATUS_ACTIVE).update(
+            status=IndexBuild.STATUS_RETIRED
+        )
+        build.status = IndexBuild.STATUS_ACTIVE
+        build.activated_at = timezone.now()
+        build.save(update_fields=['status', 'activated_at', 'updated_at'])
+    logger.info(f"Activated {build.collection_name} for tenant {build.tenant}")
+    index_sync.reconcile_tenant(build.tenant, batch_size=batch_size, target=target)
+
+
+def record_error(build, error):
+    # The build stays in STATUS_BUILDING so the next run resumes from its checkpoint
+    build.error = str(error)
+    build.save(update_fields=['error', 'updated_at'])
+
+
+def drop_inactive_collections(tenant):
+    """Deletes the tenant's retired collections (and the unversioned one once a build is active)."""
+    active = vector_store.active_index(tenant).collection_name
+    client = vector_store.get_client()
+    dropped = []
+    for collection in client.list_collections():
+        if collection.name == active or vector_store.tenant_for_collection(collection.name) != tenant:
+            continue
+        if IndexBuild.objects.filter(collection_name=collection.name, status=IndexBuild.STATUS_BUILDING).exists():
+            continue
+        client.delete_collection(collection.name)
+        dropped.append(collection.name)
+    return dropped
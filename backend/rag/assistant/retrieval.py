@@ -0,0 +1,81 @@
+from django.conf import settings
+from collections import namedtuple
+import logging
+
+from .models import PortfolioItem
+from . import embeddings
+from . import vector_store
+
+logger = logging.getLogger(__name__)
+
+# Remaining context budget below which another (truncated) item is not worth adding
+MIN_CONTEXT_TOKENS = 100
+CHARS_PER_TOKEN = 4
+
+# `candidates` holds every (vector_id, distance) considered, including those cut off
+Retrieval = namedtuple('Retrieval', ['items', 'context', 'candidates'])
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English with Llama/GPT tokenizers)."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def embed_query(query, target):
+    """Embeds a query with the model that built the target collection."""
+    return embeddings.encode([query], target.model_name)[0]
+
+
+def nearest_vectors(query_embedding, tenant, target, where=None, n_results=5):
+    """Returns (vector_id, distance) pairs, nearest first, without touching the database."""
+    collection = vector_store.get_collection(tenant, target)
+    results = collection.query(
+        query_embeddings=[query_embedding], n_results=n_results, where=where, include=['distances']
+    )
+    logger.info(f"Retrieved vector IDs: {results['ids'][0]}")
+    return list(zip(results['ids'][0], results['distances'][0]))
+
+
+def load_items(matches, tenant):
+    """Loads the items behind (vector_id, distance) pairs, nearest first, each with `distance` set."""
+    distances = dict(matches)
+    items = list(PortfolioItem.objects.filter(vector_id__in=distances, tenant=tenant))
+    for item in items:
+        item.distance = distances[item.vector_id]
+    return sorted(items, key=lambda item: item.distance)
+
+
+def nearest_items(query_embedding, tenant, target, where=None, n_results=5):
+    return load_items(nearest_vectors(query_embedding, tenant, target, where, n_results), tenant)
+
+
+def retrieve(query_embedding, tenant, target, where=None):
+    """
+    Picks the context for a query by distance instead of a fixed result count.
+
+    Up to settings.RETRIEVAL_MAX_RESULTS candidates are fetched, those farther than
+    settings.RETRIEVAL_MAX_DISTANCE are dropped, and the rest are added nearest first until
+    settings.RETRIEVAL_CONTEXT_TOKENS is spent; the last item is truncated to fit. Broad questions
+    with many close items get more context, off-topic ones get none.
+
+    Returns:
+        Retrieval: The selected items, their (possibly truncated) contents, and all candidates.
+    """
+    candidates = nearest_vectors(query_embedding, tenant, target, where, settings.RETRIEVAL_MAX_RESULTS)
+    relevant = [(vector_id, distance) for vector_id, distance in candidates if distance <= settings.RETRIEVAL_MAX_DISTANCE]
+    items, context = [], []
+    budget = settings.RETRIEVAL_CONTEXT_TOKENS
+    for item in load_items(relevant, tenant):
+        if items and budget < MIN_CONTEXT_TOKENS:
+            break
+        text = item.content or ''
+        if estimate_tokens(text) > budget:
+            text = text[:budget * CHARS_PER_TOKEN]
+        items.append(item)
+        context.append(text)
+        budget -= estimate_tokens(text)
+    logger.debug(
+        f"Selected {len(items)} of {len(candidates)} candidate(s) within distance "
+        f"{settings.RETRIEVAL_MAX_DISTANCE} ({settings.RETRIEVAL_CONTEXT_TOKENS - budget} tokens)"
+    )
+    return Retrieval(items, context, candidates)
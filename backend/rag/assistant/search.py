@@ -0,0 +1,133 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models.expressions import RawSQL
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'assistant_portfolioitem_fts'
+
+# The database wraps matches in these private-use characters; split_highlights() turns them into
+# offsets so snippets stay plain text and stored (possibly scraped) content is never sent as markup
+HIGHLIGHT_START = '\ue000'
+HIGHLIGHT_STOP = '\ue001'
+
+# External-content FTS5 table kept in sync by triggers. SQLite drops a table's triggers when
+# Django remakes it during a migration, so migrations that alter PortfolioItem on SQLite must
+# call install_fulltext_index() again.
+SQLITE_FTS_SQL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, content, source_url,
+        content='assistant_portfolioitem', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON assistant_portfolioitem BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, content, source_url)
+        VALUES (new.id, new.title, new.content, new.source_url);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON assistant_portfolioitem BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content, source_url)
+        VALUES ('delete', old.id, old.title, old.content, old.source_url);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF title, content, source_url ON assistant_portfolioitem BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content, source_url)
+        VALUES ('delete', old.id, old.title, old.content, old.source_url);
+        INSERT INTO {FTS_TABLE}(rowid, title, content, source_url)
+        VALUES (new.id, new.title, new.content, new.source_url);
+    END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+POSTGRES_DOCUMENT = (
+    "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(source_url, '') || ' ' || coalesce(content, ''))"
+)
+POSTGRES_FTS_SQL = [
+    f"CREATE INDEX IF NOT EXISTS assistant_portfolioitem_fts_idx ON assistant_portfolioitem USING GIN (({POSTGRES_DOCUMENT}))",
+]
+
+
+def install_fulltext_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'sqlite': SQLITE_FTS_SQL, 'postgresql': POSTGRES_FTS_SQL}.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def remove_fulltext_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS assistant_portfolioitem_fts_idx")
+
+
+def split_highlights(marked):
+    """
+    Removes the highlight markers from a database snippet.
+
+    Returns:
+        tuple: (plain text, [[start, end], ...]) with offsets in characters (code points) of the text.
+    """
+    text = []
+    highlights = []
+    length = 0
+    start = None
+    for part in re.split(f'([{HIGHLIGHT_START}{HIGHLIGHT_STOP}])', marked):
+        if part == HIGHLIGHT_START:
+            start = length
+        elif part == HIGHLIGHT_STOP:
+            if start is not None:
+                highlights.append([start, length])
+                start = None
+        else:
+            text.append(part)
+            length += len(part)
+    return ''.join(text), highlights
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query.lower())
+
+
+def search_items(queryset, query):
+    """
+    Filters items by a full-text match on title, source URL and content.
+
+    The matching rows are annotated with `search_snippet`, a short excerpt of the content with the
+    matched terms wrapped in HIGHLIGHT_START/HIGHLIGHT_STOP. Only the rows of the returned page pay for it.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset.none()
+    start, stop = HIGHLIGHT_START, HIGHLIGHT_STOP
+
+    if connection.vendor == 'sqlite':
+        # Quote every term so user input can never be parsed as FTS5 query syntax
+        match = ' '.join(f'"{term}"' for term in terms)
+        return queryset.filter(
+            id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+        ).annotate(search_snippet=RawSQL(
+            f"SELECT snippet({FTS_TABLE}, 1, %s, %s, '…', %s) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND rowid = assistant_portfolioitem.id",
+            [start, stop, settings.SEARCH_SNIPPET_WORDS, match]
+        ))
+
+    if connection.vendor == 'postgresql':
+        options = f"StartSel={start}, StopSel={stop}, MaxWords={settings.SEARCH_SNIPPET_WORDS}, MinWords=5"
+        return queryset.filter(id__in=RawSQL(
+            f"SELECT id FROM assistant_portfolioitem WHERE {POSTGRES_DOCUMENT} @@ plainto_tsquery('english', %s)",
+            [query]
+        )).annotate(search_snippet=RawSQL(
+            "ts_headline('english', coalesce(content, ''), plainto_tsquery('english', %s), %s)",
+            [query, options]
+        ))
+
+    logger.warning(f"No full-text index for database vendor {connection.vendor}; falling back to icontains")
+    for term in terms:
+        queryset = queryset.filter(content__icontains=term)
+    return queryset
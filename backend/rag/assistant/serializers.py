@@ -1,15 +1,49 @@
 from rest_framework import serializers
-from .models import PortfolioItem
+from .models import PortfolioItem, Conversation, ConversationTurn
+from . import search
 import json
 import os
 from django.conf import settings
 
-class PortfolioItemSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """Lets callers pass `fields=[...]` to serialize only a subset of the declared fields."""
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class PortfolioItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    snippet = serializers.SerializerMethodField()
+    highlights = serializers.SerializerMethodField()
+
     class Meta:
         model = PortfolioItem
-        fields = ['id', 'title', 'content', 'source_type', 'source_url', 'created_at', 'updated_at', 'metadata']
+        fields = ['id', 'title', 'content', 'snippet', 'highlights', 'source_type', 'source_url', 'created_at', 'updated_at', 'metadata', 'tenant']
         read_only_fields = ['id', 'content', 'vector_id', 'created_at', 'updated_at']
 
+    def get_snippet(self, obj):
+        # Search results carry an excerpt around the matches computed by the database
+        snippet = getattr(obj, 'search_snippet', None)
+        if snippet:
+            return search.split_highlights(snippet)[0]
+        # List views annotate a prefix of the content instead of loading the whole text
+        content = getattr(obj, 'content_prefix', None)
+        if content is None:
+            content = obj.content
+        content = content or ''
+        if len(content) <= settings.SNIPPET_LENGTH:
+            return content
+        return content[:settings.SNIPPET_LENGTH].rstrip() + '…'
+
+    def get_highlights(self, obj):
+        """[start, end) character offsets of the search matches in `snippet`; empty outside search."""
+        snippet = getattr(obj, 'search_snippet', None)
+        return search.split_highlights(snippet)[1] if snippet else []
+
     def validate_metadata(self, value):
         if isinstance(value, dict):
             return value
@@ -42,16 +76,44 @@ class PortfolioItemSerializer(serializers.ModelSerializer):
 
 class QuerySerializer(serializers.Serializer):
     query = serializers.CharField(max_length=500, required=True)
+    tenant = serializers.SlugField(max_length=50, required=False, default=settings.DEFAULT_TENANT)
+    source_types = serializers.ListField(
+        child=serializers.ChoiceField(choices=[choice[0] for choice in PortfolioItem.SOURCE_TYPE_CHOICES]),
+        required=False,
+        default=list
+    )
+    tags = serializers.ListField(child=serializers.CharField(max_length=100), required=False, default=list)
+    include_content = serializers.BooleanField(required=False, default=False)
 
     def validate_query(self, value):
         if not value.strip():
             raise serializers.ValidationError("Query cannot be empty")
         return value
 
+class ConversationTurnSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ConversationTurn
+        fields = ['id', 'query', 'standalone_query', 'response', 'created_at']
+
+
+class ConversationSerializer(serializers.ModelSerializer):
+    turns = ConversationTurnSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Conversation
+        fields = ['id', 'tenant', 'summary', 'turns', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'summary', 'turns', 'created_at', 'updated_at']
+
+
+class ConversationMessageSerializer(QuerySerializer):
+    tenant = None  # Fixed by the conversation
+
+
 class UploadPDFSerializer(serializers.Serializer):
     file = serializers.FileField(required=True)
     title = serializers.CharField(max_length=200, required=False, allow_blank=True)
     metadata = serializers.JSONField(required=False, default=dict)
+    tenant = serializers.SlugField(max_length=50, required=False, default=settings.DEFAULT_TENANT)
 
     def validate_file(self, value):
         if not value.name.endswith('.pdf'):
@@ -73,6 +135,7 @@ class AddWebContentSerializer(serializers.Serializer):
     title = serializers.CharField(max_length=200, required=False, allow_blank=True)
     source_type = serializers.ChoiceField(choices=['website', 'social_media'], default='website')
     metadata = serializers.JSONField(required=False, default=dict)
+    tenant = serializers.SlugField(max_length=50, required=False, default=settings.DEFAULT_TENANT)
 
     def validate_metadata(self, value):
         if isinstance(value, dict):
@@ -86,6 +149,7 @@ class AddExistingPDFSerializer(serializers.Serializer):
     filename = serializers.CharField(max_length=255, required=True)
     title = serializers.CharField(max_length=200, required=False, allow_blank=True)
     metadata = serializers.JSONField(required=False, default=dict)
+    tenant = serializers.SlugField(max_length=50, required=False, default=settings.DEFAULT_TENANT)
 
     def validate_filename(self, value):
         file_path = os.path.join(settings.MEDIA_ROOT, value.replace('media/', ''))
@@ -0,0 +1,23 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import PortfolioItem
+from . import answers
+from . import http_cache
+from . import index_sync
+
+
+@receiver(post_save, sender=PortfolioItem)
+def enqueue_item_upsert(sender, instance, raw=False, **kwargs):
+    http_cache.bump()
+    if raw:  # Fixture loading; run reconcile_index afterwards
+        return
+    index_sync.enqueue_upsert(instance)
+    answers.mark_stale(instance)
+
+
+@receiver(post_delete, sender=PortfolioItem)
+def enqueue_item_delete(sender, instance, **kwargs):
+    http_cache.bump()
+    index_sync.enqueue_delete(instance)
+    answers.mark_stale(instance, deleted=True)
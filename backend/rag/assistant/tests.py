@@ -1,3 +1,871 @@
-from django.test import TestCase
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.conf import settings
+from django.core.management import call_command
+from django.http import Http404
+from django.utils import timezone
+from django.db import connection, connections
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import re
+import time
+import unittest
+from datetime import timedelta
+from io import StringIO
+import zlib
+from unittest import mock
 
-# Create your tests here.
+from . import answers
+from . import conversation as conversations
+from . import extraction
+from . import http_cache
+from . import index_sync
+from . import llm
+from . import media
+from . import reindex
+from . import query_log
+from . import retrieval
+from . import throttling
+from . import vector_store
+from .deadline import Deadline, DeadlineExceeded
+from .mock_llm import start_server
+from .models import Conversation, IndexBuild, IndexOutbox, IndexVersion, PortfolioItem, PrecomputedAnswer, QueryLog
+from .numpy_index import NumpyClient
+
+# Loaded lazily behind the service modules; importing any of them at startup costs seconds and hundreds of MB.
+# `requests` is not listed because rest_framework.compat imports it whenever it is installed.
+HEAVY_MODULES = ('torch', 'transformers', 'sentence_transformers', 'chromadb', 'PyPDF2', 'bs4')
+
+
+def keyword_embeddings(texts, model_name=None):
+    """Stands in for embeddings.encode: one hashed dimension per word, so shared words mean nearby vectors."""
+    vectors = []
+    for text in texts:
+        vector = [0.0] * 256
+        for word in re.findall(r'[a-z0-9]+', text.lower()):
+            vector[zlib.crc32(word.encode()) % 256] += 1
+        norm = sum(value * value for value in vector) ** 0.5 or 1
+        vectors.append([value / norm for value in vector])
+    return vectors
+
+
+@override_settings(
+    LLM_PROVIDERS=[{'NAME': 'mock', 'BACKEND': 'assistant.llm.MockProvider'}], LLM_HEDGE_AFTER=0,
+    QUERY_LOG_ENABLED=False, INDEX_SYNC_ON_COMMIT=False
+)
+class IndexedTestCase(TestCase):
+    """Runs the API against a NumPy index in a temporary directory, keyword embeddings and the mock LLM."""
+
+    def setUp(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path, True)
+        self.addCleanup(setattr, vector_store, '_client', vector_store._client)
+        vector_store._client = NumpyClient(path)
+        patcher = mock.patch('assistant.embeddings.encode', side_effect=keyword_embeddings)
+        self.encode = patcher.start()
+        self.addCleanup(patcher.stop)
+        throttling.reset()
+        self.addCleanup(throttling.reset)
+        self.client = Client(HTTP_HOST='localhost')
+
+    def create_item(self, content, **fields):
+        return PortfolioItem.objects.create(title=content[:20], content=content, **fields)
+
+    def ask(self, query, **data):
+        response = self.client.post('/api/query/', dict(query=query, **data), content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "SQLite-specific configuration")
+class SQLiteConfigurationTests(SimpleTestCase):
+    """Checks the connection settings in both journal modes SQLITE_JOURNAL_MODE can select."""
+
+    JOURNAL_MODES = ('WAL', 'DELETE')
+
+    def open_file_connection(self, directory, journal_mode):
+        # The test database is in-memory, where journal modes do not apply, so check against a file
+        options = dict(connection.settings_dict['OPTIONS'])
+        options['init_command'] = re.sub(r'journal_mode=\w+', f'journal_mode={journal_mode}', options['init_command'])
+        settings_dict = dict(
+            connection.settings_dict, NAME=os.path.join(directory, 'pragma.sqlite3'), OPTIONS=options
+        )
+        wrapper = type(connections['default'])(settings_dict, alias='pragma_check')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_journal_mode_applied_on_connect(self):
+        for journal_mode in self.JOURNAL_MODES:
+            with self.subTest(journal_mode=journal_mode), tempfile.TemporaryDirectory() as directory:
+                wrapper = self.open_file_connection(directory, journal_mode)
+                self.assertEqual(self.pragma(wrapper, 'journal_mode').upper(), journal_mode)
+                self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)  # NORMAL
+                wrapper.close()
+
+    def test_busy_timeout_applied_on_connect(self):
+        for journal_mode in self.JOURNAL_MODES:
+            with self.subTest(journal_mode=journal_mode), tempfile.TemporaryDirectory() as directory:
+                wrapper = self.open_file_connection(directory, journal_mode)
+                self.assertEqual(self.pragma(wrapper, 'busy_timeout'), int(settings.SQLITE_BUSY_TIMEOUT * 1000))
+                wrapper.close()
+
+    def test_reader_not_blocked_by_open_write_transaction(self):
+        for journal_mode in self.JOURNAL_MODES:
+            with self.subTest(journal_mode=journal_mode), tempfile.TemporaryDirectory() as directory:
+                writer = self.open_file_connection(directory, journal_mode)
+                reader = self.open_file_connection(directory, journal_mode)
+                with writer.cursor() as cursor:
+                    cursor.execute("CREATE TABLE item (id INTEGER PRIMARY KEY, title TEXT)")
+                    cursor.execute("INSERT INTO item (title) VALUES ('committed')")
+                writer.set_autocommit(False)
+                with writer.cursor() as cursor:
+                    cursor.execute("INSERT INTO item (title) VALUES ('pending')")
+                with reader.cursor() as cursor:
+                    cursor.execute("SELECT title FROM item")
+                    self.assertEqual(cursor.fetchall(), [('committed',)])
+                writer.rollback()
+                writer.set_autocommit(True)
+                reader.close()
+                writer.close()
+
+
+class ImportTimeTests(SimpleTestCase):
+    """Guards the cold start of processes that never answer a query (migrate, shell, admin, workers)."""
+
+    def import_times(self, code):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            cwd=settings.BASE_DIR,
+            env=dict(os.environ, DJANGO_SETTINGS_MODULE='rag.settings', PRELOAD_MODELS='False'),
+            capture_output=True,
+            text=True,
+            timeout=300
+        )
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+        times = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:'):
+                continue
+            _, cumulative, name = [part.strip() for part in line[len('import time:'):].split('|')]
+            if cumulative.isdigit():
+                times[name] = int(cumulative)
+        return times
+
+    def test_app_startup_does_not_import_heavy_dependencies(self):
+        times = self.import_times(
+            "import django; django.setup(); "
+            "import assistant.admin, assistant.urls, assistant.views, assistant.index_sync, "
+            "assistant.management.commands.reconcile_index, assistant.management.commands.reindex"
+        )
+        heavy = sorted(name for name in times if name.split('.')[0] in HEAVY_MODULES)
+        self.assertEqual(heavy, [], f"Heavy modules imported at startup: {heavy}")
+
+
+class LLMProviderTests(SimpleTestCase):
+    """Routing across providers, exercised over HTTP against local mock servers."""
+
+    MESSAGES = [{"role": "user", "content": "Which projects use Django?"}]
+
+    def start(self, **behaviour):
+        server = start_server(**behaviour)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def providers(self, *servers, timeout=5):
+        return [
+            {
+                'NAME': f'mock{index}',
+                'BACKEND': 'assistant.llm.OpenAICompatibleProvider',
+                'BASE_URL': server.base_url,
+                'MODEL': 'mock',
+                'TIMEOUT': timeout,
+            }
+            for index, server in enumerate(servers)
+        ]
+
+    def test_falls_back_to_next_provider_on_error(self):
+        failing = self.start(status=503)
+        healthy = self.start(response="fallback answer")
+        with override_settings(LLM_PROVIDERS=self.providers(failing, healthy), LLM_HEDGE_AFTER=0):
+            self.assertEqual(llm.chat(self.MESSAGES), "fallback answer")
+        self.assertEqual((failing.requests, healthy.requests), (1, 1))
+
+    def test_open_circuit_skips_failing_provider(self):
+        failing = self.start(status=500)
+        healthy = self.start()
+        with override_settings(
+            LLM_PROVIDERS=self.providers(failing, healthy), LLM_HEDGE_AFTER=0,
+            LLM_CIRCUIT_FAILURES=2, LLM_CIRCUIT_RESET=60
+        ):
+            for _ in range(4):
+                llm.chat(self.MESSAGES)
+        self.assertEqual(failing.requests, 2)
+        self.assertEqual(healthy.requests, 4)
+
+    def test_slow_provider_is_hedged(self):
+        slow = self.start(delay=2, response="slow answer")
+        fast = self.start(response="fast answer")
+        with override_settings(LLM_PROVIDERS=self.providers(slow, fast), LLM_HEDGE_AFTER=0.2):
+            started = time.monotonic()
+            self.assertEqual(llm.chat(self.MESSAGES), "fast answer")
+        self.assertLess(time.monotonic() - started, 1.5)
+
+    def test_deadline_bounds_generation(self):
+        slow = self.start(delay=2)
+        with override_settings(LLM_PROVIDERS=self.providers(slow), LLM_HEDGE_AFTER=0):
+            started = time.monotonic()
+            with self.assertRaises(DeadlineExceeded):
+                llm.chat(self.MESSAGES, deadline=Deadline(0.3))
+        self.assertLess(time.monotonic() - started, 1.5)
+
+    def test_timed_out_wait_without_hedge_raises_deadline(self):
+        # wait() may come back empty with a sliver of the deadline left and no provider to hedge with
+        providers = [{'NAME': 'slow', 'BACKEND': 'assistant.llm.MockProvider', 'DELAY': 0.5}]
+        with override_settings(LLM_PROVIDERS=providers, LLM_HEDGE_AFTER=0), \
+                mock.patch('assistant.llm.wait', return_value=(set(), set())):
+            with self.assertRaises(DeadlineExceeded):
+                llm.chat(self.MESSAGES, deadline=Deadline(10))
+
+    def test_half_open_fallback_keeps_its_probe_until_called(self):
+        providers = [
+            {'NAME': 'primary', 'BACKEND': 'assistant.llm.MockProvider'},
+            {'NAME': 'fallback', 'BACKEND': 'assistant.llm.MockProvider'},
+        ]
+        with override_settings(LLM_PROVIDERS=providers, LLM_HEDGE_AFTER=0, LLM_CIRCUIT_RESET=60):
+            primary, fallback = llm.get_providers()
+            fallback.breaker.opened_at = time.monotonic() - 61
+            self.assertEqual(llm.chat_completion(self.MESSAGES).provider, 'primary')
+            primary.fail = True
+            self.assertEqual(llm.chat_completion(self.MESSAGES).provider, 'fallback')
+        self.assertIsNone(fallback.breaker.opened_at)
+
+
+@override_settings(QUERY_LOG_ENABLED=True, QUERY_LOG_BATCH_SIZE=3, QUERY_LOG_FLUSH_INTERVAL=3600)
+class QueryLogTests(TestCase):
+
+    def tearDown(self):
+        query_log.flush()
+
+    def record(self, query):
+        timer = query_log.StageTimer()
+        with timer.stage('retrieval'):
+            pass
+        query_log.record(QueryLog(query=query, retrieved_ids=[1, 2], scores=[0.1, 0.2]), timer, 200)
+
+    def test_entries_are_written_in_batches(self):
+        self.record("first")
+        self.record("second")
+        self.assertEqual(QueryLog.objects.count(), 0)
+        self.record("third")
+        self.assertEqual(QueryLog.objects.count(), 3)
+        self.record("fourth")
+        self.assertEqual(query_log.flush(), 1)
+        self.assertEqual(QueryLog.objects.count(), 4)
+
+    def test_entry_keeps_stage_timings(self):
+        self.record("timed")
+        query_log.flush()
+        entry = QueryLog.objects.get()
+        self.assertEqual(set(entry.timings), {'retrieval'})
+        self.assertGreaterEqual(entry.total_ms, entry.timings['retrieval'])
+
+    def test_embedding_hash_ignores_float_noise(self):
+        self.assertEqual(query_log.embedding_hash([0.1, 0.2]), query_log.embedding_hash([0.100001, 0.2]))
+        self.assertNotEqual(query_log.embedding_hash([0.1, 0.2]), query_log.embedding_hash([0.2, 0.1]))
+
+
+class QueryReportTests(TestCase):
+
+    def report(self):
+        out = StringIO()
+        call_command('query_report', stdout=out)
+        return out.getvalue()
+
+    def test_report_without_answered_queries(self):
+        self.assertIn("No queries logged", self.report())
+        QueryLog.objects.create(query="django", status=504)
+        output = self.report()
+        self.assertIn("1 queries in the last 7 day(s), 1 failed", output)
+        self.assertIn("No answered queries to report on", output)
+
+    def test_report_sections(self):
+        for query in ("Django projects", "django  projects", "Flask projects"):
+            QueryLog.objects.create(query=query, timings={'retrieval': 5.0}, total_ms=20.0, scores=[0.4])
+        output = self.report()
+        self.assertRegex(output, r"Repeated query text:\s+33\.3%")
+        self.assertRegex(output, r"retrieval\s+3\s+5\.0")
+        self.assertIn("Retrieval depth", output)
+
+
+class NumpyIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        import numpy as np
+
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path, True)
+        rng = np.random.default_rng(0)
+        self.vectors = rng.normal(size=(100, 8)).astype(np.float32)
+        self.ids = [f"item_{index}" for index in range(100)]
+        self.metadatas = [{"source_type": "pdf" if index % 2 else "web"} for index in range(100)]
+
+    def collection(self, dtype='float32'):
+        collection = NumpyClient(self.path, dtype=dtype).get_or_create_collection('portfolio')
+        collection.upsert(ids=self.ids, embeddings=self.vectors.tolist(), metadatas=self.metadatas)
+        return collection
+
+    def nearest(self, collection, index, **kwargs):
+        return collection.query(query_embeddings=[self.vectors[index].tolist()], n_results=3, **kwargs)
+
+    def test_query_returns_nearest_first_with_squared_l2_distances(self):
+        for dtype in ('float32', 'int8'):
+            with self.subTest(dtype=dtype):
+                result = self.nearest(self.collection(dtype), 42)
+                self.assertEqual(result['ids'][0][0], 'item_42')
+                self.assertAlmostEqual(result['distances'][0][0], 0, places=1)
+                self.assertEqual(result['distances'][0], sorted(result['distances'][0]))
+                NumpyClient(self.path).delete_collection('portfolio')
+
+    def test_where_filter(self):
+        result = self.nearest(self.collection(), 42, where={"source_type": {"$in": ["pdf"]}})
+        self.assertTrue(all(int(vector_id.split('_')[1]) % 2 for vector_id in result['ids'][0]))
+
+    def test_upsert_replaces_and_delete_tombstones_until_compaction(self):
+        collection = self.collection()
+        collection.upsert(ids=['item_42'], embeddings=[(-self.vectors[42]).tolist()])
+        self.assertNotEqual(self.nearest(collection, 42)['ids'][0][0], 'item_42')
+        generation = collection.state.meta['generation']
+        collection.delete(ids=self.ids[:10])
+        self.assertEqual(collection.count(), 90)
+        self.assertEqual(collection.state.meta['generation'], generation)
+        collection.delete(ids=self.ids[10:40])
+        self.assertGreater(collection.state.meta['generation'], generation)
+        self.assertEqual(collection.state.meta['count'], 60)
+
+    def test_changes_are_visible_to_other_clients(self):
+        collection = self.collection()
+        reader = NumpyClient(self.path).get_or_create_collection('portfolio')
+        self.assertEqual(reader.count(), 100)
+        collection.delete(ids=['item_42'])
+        self.assertEqual(reader.count(), 99)
+        self.assertEqual(len(reader.get(limit=50, offset=60)['ids']), 39)
+
+
+@override_settings(RETRIEVAL_MAX_DISTANCE=0.5, RETRIEVAL_MAX_RESULTS=10, RETRIEVAL_CONTEXT_TOKENS=300)
+class RetrievalTests(TestCase):
+
+    def setUp(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path, True)
+        self.addCleanup(setattr, vector_store, '_client', vector_store._client)
+        vector_store._client = NumpyClient(path)
+        self.target = vector_store.IndexTarget('portfolio', settings.EMBEDDING_MODEL_NAME)
+        collection = vector_store.get_collection(target=self.target)
+        # Unit vectors at squared L2 distances 0, 0.2, 0.4, 1.0 and 2.0 from [1, 0]
+        for index, cosine in enumerate((1.0, 0.9, 0.8, 0.5, 0.0)):
+            vector_id = f"item_{index}"
+            PortfolioItem.objects.create(title=vector_id, content='x' * 760, vector_id=vector_id)
+            collection.upsert(ids=[vector_id], embeddings=[[cosine, (1 - cosine ** 2) ** 0.5]])
+
+    def test_keeps_items_within_distance_and_token_budget(self):
+        retrieved = retrieval.retrieve([1.0, 0.0], settings.DEFAULT_TENANT, self.target)
+        self.assertEqual(len(retrieved.candidates), 5)
+        # Three items are close enough; the budget fits the first one and a truncated second
+        self.assertEqual([item.vector_id for item in retrieved.items], ['item_0', 'item_1'])
+        self.assertEqual([len(text) for text in retrieved.context], [760, 436])
+
+    def test_off_topic_query_selects_nothing(self):
+        retrieved = retrieval.retrieve([-1.0, 0.0], settings.DEFAULT_TENANT, self.target)
+        self.assertEqual(retrieved.items, [])
+        self.assertEqual(retrieved.context, [])
+
+
+class OCRFallbackTests(SimpleTestCase):
+
+    def setUp(self):
+        import PyPDF2
+
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path, True)
+        self.pdf = os.path.join(self.path, 'scan.pdf')
+        writer = PyPDF2.PdfWriter()
+        writer.add_blank_page(width=200, height=200)
+        with open(self.pdf, 'wb') as file:
+            writer.write(file)
+        settings_override = override_settings(
+            OCR_ENABLED=True, OCR_CACHE_PATH=os.path.join(self.path, 'cache'),
+            OCR_TESSERACT_CMD='missing-tesseract', OCR_PDFTOPPM_CMD='missing-pdftoppm'
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def page_hash(self):
+        import PyPDF2
+
+        return extraction.page_hash(PyPDF2.PdfReader(self.pdf).pages[0])
+
+    def test_pages_without_text_are_read_from_the_ocr_cache(self):
+        extraction._write_cache(self.page_hash(), "Scanned resume")
+        self.assertEqual(extraction.extract_pdf_text(self.pdf), "Scanned resume")
+
+    def test_cache_is_keyed_by_ocr_settings(self):
+        extraction._write_cache(self.page_hash(), "Scanned resume")
+        with override_settings(OCR_LANGUAGES='deu'):
+            # A cache miss with the OCR tools missing leaves the page empty instead of failing
+            self.assertEqual(extraction.extract_pdf_text(self.pdf), "")
+
+    def test_slow_page_is_cut_off_at_the_document_timeout(self):
+        import PyPDF2
+
+        writer = PyPDF2.PdfWriter()
+        writer.add_blank_page(width=200, height=200)
+        writer.add_blank_page(width=300, height=300)
+        pdf = os.path.join(self.path, 'two-pages.pdf')
+        with open(pdf, 'wb') as file:
+            writer.write(file)
+        # Stand-ins for poppler and Tesseract: page 2 renders slowly while the flag file exists
+        bin_dir = os.path.join(self.path, 'bin')
+        slow = os.path.join(self.path, 'slow')
+        os.makedirs(bin_dir)
+        scripts = {
+            'pdftoppm': f'#!/bin/sh\nif [ "$2" = 2 ] && [ -e {slow} ]; then exec sleep 30; fi\necho "page $2"\n',
+            'tesseract': '#!/bin/sh\ncat\n',
+        }
+        for name, script in scripts.items():
+            with open(os.path.join(bin_dir, name), 'w') as file:
+                file.write(script)
+            os.chmod(os.path.join(bin_dir, name), 0o755)
+        open(slow, 'w').close()
+
+        # Workers inherit PATH when they start, so the pool is rebuilt around the test
+        if extraction._ocr_pool is not None:
+            extraction._discard_pool(extraction._ocr_pool)
+        self.addCleanup(lambda: extraction._ocr_pool and extraction._discard_pool(extraction._ocr_pool))
+        with mock.patch.dict(os.environ, {'PATH': bin_dir + os.pathsep + os.environ['PATH']}), override_settings(
+            OCR_TESSERACT_CMD='tesseract', OCR_PDFTOPPM_CMD='pdftoppm', OCR_WORKERS=2, OCR_DOCUMENT_TIMEOUT=3
+        ):
+            started = time.monotonic()
+            with self.assertLogs('assistant.extraction', 'WARNING') as logs:
+                self.assertEqual(extraction.extract_pdf_text(pdf), "page 1")
+            self.assertLess(time.monotonic() - started, 6)
+            self.assertIn("OCR finished 1 of 2 page(s)", '\n'.join(logs.output))
+
+            # The timed-out worker is free again; page 1 now comes from the cache
+            os.remove(slow)
+            started = time.monotonic()
+            self.assertEqual(extraction.extract_pdf_text(pdf), "page 1\npage 2")
+            self.assertLess(time.monotonic() - started, 3)
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        self.client = Client(HTTP_HOST='localhost')
+        self.item = PortfolioItem.objects.create(title="Resume", content="Python developer")
+
+    def test_item_etag_changes_with_any_item_write(self):
+        url = f'/api/items/{self.item.pk}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        PortfolioItem.objects.create(title="Blog", content="Posts")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_etag_depends_on_parameters(self):
+        etag = self.client.get('/api/items/')['ETag']
+        self.assertEqual(self.client.get('/api/items/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get('/api/items/?fields=id', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_bump_recreates_a_flushed_version_row(self):
+        IndexVersion.objects.all().delete()
+        http_cache.bump()
+        self.assertEqual(http_cache.index_version(), 1)
+        http_cache.bump()
+        self.assertEqual(http_cache.index_version(), 2)
+
+
+class MediaRangeTests(SimpleTestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, True)
+        with open(os.path.join(self.root, 'resume.pdf'), 'wb') as file:
+            file.write(bytes(range(256)) * 4)
+        settings_override = override_settings(MEDIA_ROOT=self.root, MEDIA_ACCEL_REDIRECT='')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def serve(self, **headers):
+        return media.serve(RequestFactory().get('/media/resume.pdf', **headers), 'resume.pdf')
+
+    def test_range_request_returns_partial_content(self):
+        response = self.serve(HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(10, 20)))
+        self.assertEqual(b''.join(self.serve(HTTP_RANGE='bytes=-4').streaming_content), bytes(range(252, 256)))
+        self.assertEqual(self.serve(HTTP_RANGE='bytes=2000-').status_code, 416)
+
+    def test_conditional_request_and_traversal(self):
+        response = self.serve()
+        self.assertEqual(response.status_code, 200)
+        response.close()
+        self.assertEqual(self.serve(HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        with self.assertRaises(Http404):
+            media.serve(RequestFactory().get('/media/x'), '../settings.py')
+
+
+class ThrottlingTests(TestCase):
+
+    def setUp(self):
+        throttling.reset()
+        self.addCleanup(throttling.reset)
+        self.client = Client(HTTP_HOST='localhost')
+
+    def test_token_bucket_allows_burst_then_refills(self):
+        self.assertEqual([throttling.take_token('client', 2, 1.0, now=0) for _ in range(3)], [0, 0, 1.0])
+        self.assertEqual(throttling.take_token('client', 2, 1.0, now=0.5), 0.5)
+        self.assertEqual(throttling.take_token('client', 2, 1.0, now=1.0), 0)
+        self.assertEqual(throttling.take_token('other', 2, 1.0, now=1.0), 0)
+
+    def test_rate_limited_client_gets_retry_after(self):
+        with override_settings(RATE_LIMITS={'browse': '2/min'}):
+            statuses = [self.client.get('/api/items/').status_code for _ in range(3)]
+            response = self.client.get('/api/items/')
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(self.client.get('/api/items/', REMOTE_ADDR='10.0.0.2').status_code, 200)
+
+    def test_forwarded_for_only_counts_behind_a_proxy(self):
+        def statuses():
+            throttling.reset()
+            return [
+                self.client.get('/api/items/', HTTP_X_FORWARDED_FOR=f'10.0.0.{n}').status_code for n in range(3)
+            ]
+
+        with override_settings(RATE_LIMITS={'browse': '2/min'}):
+            self.assertEqual(statuses(), [200, 200, 429])
+            with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}):
+                self.assertEqual(statuses(), [200, 200, 200])
+
+    def test_requests_over_the_in_flight_cap_are_shed(self):
+        with override_settings(MAX_IN_FLIGHT={'query': 1}, LOAD_SHED_RETRY_AFTER=2):
+            self.assertTrue(throttling.admit('query'))
+            response = self.client.post('/api/query/', {'query': 'hello'}, content_type='application/json')
+            throttling.release('query')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '2')
+
+
+class QueryFilterTests(IndexedTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.resume = self.create_item("Django developer resume", source_type='pdf', metadata={'tags': ['CV']})
+        self.blog = self.create_item("Django developer blog", source_type='website')
+        self.other = self.create_item("Django developer resume", tenant='acme')
+        index_sync.process_outbox()
+
+    def item_ids(self, **data):
+        return {item['id'] for item in self.ask("django developer", **data)['items']}
+
+    def test_source_type_and_tag_filters_exclude_other_items(self):
+        self.assertEqual(self.item_ids(), {self.resume.pk, self.blog.pk})
+        self.assertEqual(self.item_ids(source_types=['website']), {self.blog.pk})
+        self.assertEqual(self.item_ids(tags=['cv']), {self.resume.pk})
+        self.assertEqual(self.item_ids(source_types=['website'], tags=['cv']), set())
+
+    def test_other_tenants_items_are_never_returned(self):
+        self.assertEqual(self.item_ids(tenant='acme'), {self.other.pk})
+        self.assertNotIn(self.other.pk, self.item_ids(source_types=['pdf']))
+
+
+class PrecomputedAnswerTests(IndexedTestCase):
+
+    def setUp(self):
+        super().setUp()
+        answers._matrices.clear()
+        self.addCleanup(answers._matrices.clear)
+        self.item = self.create_item("Django search service built on Postgres")
+        index_sync.process_outbox()
+
+    def precompute(self, question):
+        return answers.generate(PrecomputedAnswer.objects.create(question=question))
+
+    def test_without_answers_queries_go_through_retrieval(self):
+        model_name = vector_store.active_index(settings.DEFAULT_TENANT).model_name
+        self.assertIsNone(answers.match(settings.DEFAULT_TENANT, keyword_embeddings(["django search service"])[0], model_name))
+        response = self.ask("Which Django search service?")
+        self.assertNotIn('precomputed', response)
+        self.assertEqual([item['id'] for item in response['items']], [self.item.pk])
+
+    def test_close_question_is_served_precomputed(self):
+        answer = self.precompute("Which Django search service?")
+        response = self.ask("which django search service")
+        self.assertTrue(response['precomputed'])
+        self.assertEqual(response['response'], answer.response)
+        self.assertEqual([item['id'] for item in response['items']], [self.item.pk])
+        self.assertNotIn('precomputed', self.ask("Django search service on Postgres"))
+
+    def test_content_change_marks_answer_stale(self):
+        answer = self.precompute("Which Django search service?")
+        self.item.title = "Search service"
+        self.item.save()
+        answer.refresh_from_db()
+        self.assertFalse(answer.stale)
+        self.item.content = "Django search service built on Elasticsearch"
+        self.item.save()
+        answer.refresh_from_db()
+        self.assertTrue(answer.stale)
+        self.assertNotIn('precomputed', self.ask("Which Django search service?"))
+
+    def test_failed_question_does_not_stop_the_others(self):
+        def encode(texts, model_name=None):
+            if 'broken' in texts[0]:
+                raise RuntimeError("embedding service down")
+            return keyword_embeddings(texts, model_name)
+
+        self.encode.side_effect = encode
+        out, err = StringIO(), StringIO()
+        call_command(
+            'precompute_answers', question=["Which Django search service?", "broken question", "Django on Postgres?"],
+            stdout=out, stderr=err
+        )
+        self.assertIn("Generated 2 answer(s), 1 failed", out.getvalue())
+        self.assertIn("embedding service down", err.getvalue())
+        self.assertEqual(
+            sorted(PrecomputedAnswer.objects.filter(stale=False).values_list('question', flat=True)),
+            ["Django on Postgres?", "Which Django search service?"]
+        )
+
+
+class IndexOutboxTests(IndexedTestCase):
+
+    def collection(self, tenant=None):
+        return vector_store.get_collection(tenant)
+
+    def outbox(self):
+        return set(IndexOutbox.objects.values_list('tenant', 'vector_id', 'operation'))
+
+    def test_delete_enqueues_delete(self):
+        item = self.create_item("Django developer resume")
+        index_sync.process_outbox()
+        vector_id = f"item_{item.pk}"
+        item.delete()
+        self.assertEqual(self.outbox(), {(settings.DEFAULT_TENANT, vector_id, IndexOutbox.OPERATION_DELETE)})
+        self.assertEqual(index_sync.process_outbox(), (1, 0))
+        self.assertEqual(self.collection().count(), 0)
+
+    def test_tenant_change_deletes_from_old_tenant(self):
+        item = self.create_item("Django developer resume")
+        index_sync.process_outbox()
+        item = PortfolioItem.objects.get(pk=item.pk)
+        item.tenant = 'acme'
+        item.save()
+        vector_id = f"item_{item.pk}"
+        self.assertEqual(self.outbox(), {
+            (settings.DEFAULT_TENANT, vector_id, IndexOutbox.OPERATION_DELETE),
+            ('acme', vector_id, IndexOutbox.OPERATION_UPSERT),
+        })
+        index_sync.process_outbox()
+        self.assertEqual(self.collection().count(), 0)
+        self.assertEqual(self.collection('acme').count(), 1)
+
+    def test_failed_upsert_is_kept_and_backed_off(self):
+        self.encode.side_effect = RuntimeError("embedding service down")
+        self.create_item("Django developer resume")
+        self.assertEqual(index_sync.process_outbox(), (0, 1))
+        entry = IndexOutbox.objects.get()
+        self.assertEqual((entry.attempts, entry.last_error), (1, "embedding service down"))
+        # Within the backoff window other commits do not retry it
+        self.assertEqual(index_sync.process_outbox(), (0, 0))
+        IndexOutbox.objects.update(attempts=settings.INDEX_SYNC_MAX_ATTEMPTS, updated_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(index_sync.process_outbox(), (0, 0))
+        self.encode.side_effect = keyword_embeddings
+        self.assertEqual(index_sync.process_outbox(retry_failed=True), (1, 0))
+        self.assertFalse(IndexOutbox.objects.exists())
+        self.assertEqual(self.collection().count(), 1)
+
+    def test_reconcile_removes_orphans_and_reupserts_changed_rows(self):
+        item = self.create_item("Django developer resume")
+        index_sync.process_outbox()
+        vector_id = f"item_{item.pk}"
+        collection = self.collection()
+        collection.upsert(ids=['item_999'], embeddings=keyword_embeddings(["orphan"]), metadatas=[{"content_hash": "x"}])
+        metadata = dict(vector_store.build_metadata(item), content_hash="outdated")
+        collection.upsert(ids=[vector_id], embeddings=keyword_embeddings(["old text"]), metadatas=[metadata])
+
+        self.assertEqual(index_sync.reconcile_tenant(settings.DEFAULT_TENANT), ([item.pk], ['item_999']))
+        indexed = dict(vector_store.iter_indexed(settings.DEFAULT_TENANT, 10))
+        self.assertEqual(set(indexed), {vector_id})
+        self.assertEqual(indexed[vector_id]['content_hash'], item.content_hash)
+        self.assertEqual(index_sync.reconcile_tenant(settings.DEFAULT_TENANT), ([], []))
+
+
+class ReindexTests(IndexedTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.items = [self.create_item(f"Project number {index}") for index in range(3)]
+        index_sync.process_outbox()
+        self.encode.reset_mock()
+
+    def build(self, tenant=settings.DEFAULT_TENANT):
+        return reindex.start_build(tenant, settings.EMBEDDING_MODEL_NAME)
+
+    def test_run_build_resumes_from_checkpoint(self):
+        self.encode.side_effect = [keyword_embeddings(["first"]), RuntimeError("interrupted")]
+        build = self.build()
+        with self.assertRaises(RuntimeError):
+            reindex.run_build(build, batch_size=1)
+        build.refresh_from_db()
+        self.assertEqual(build.last_item_id, self.items[0].pk)
+
+        self.encode.side_effect = keyword_embeddings
+        self.encode.reset_mock()
+        resumed = self.build()
+        self.assertEqual(resumed.pk, build.pk)
+        reindex.run_build(resumed, batch_size=1)
+        self.assertEqual([call.args[0] for call in self.encode.call_args_list], [["Project number 1"], ["Project number 2"]])
+        self.assertEqual((resumed.last_item_id, resumed.items_indexed), (self.items[-1].pk, 3))
+        self.assertEqual(vector_store.get_collection(target=reindex.target_for(resumed)).count(), 3)
+
+    def test_activate_retires_previous_build(self):
+        first = self.build()
+        reindex.run_build(first)
+        reindex.activate(first)
+        self.assertEqual(vector_store.active_index(), reindex.target_for(first))
+
+        second = self.build()
+        self.assertNotEqual(second.collection_name, first.collection_name)
+        reindex.run_build(second)
+        reindex.activate(second)
+        first.refresh_from_db()
+        self.assertEqual(first.status, IndexBuild.STATUS_RETIRED)
+        self.assertEqual(vector_store.active_index(), reindex.target_for(second))
+        self.assertEqual(
+            sorted(reindex.drop_inactive_collections(settings.DEFAULT_TENANT)),
+            sorted([vector_store.collection_name(), first.collection_name])
+        )
+
+    def test_long_tenant_gets_a_valid_collection_name(self):
+        tenant = 'a' * 50
+        build = self.build(tenant)
+        IndexBuild.objects.filter(pk=build.pk).update(collection_name=vector_store.versioned_collection_name(tenant, 123456))
+        build.refresh_from_db()
+        self.assertLessEqual(len(build.collection_name), vector_store.MAX_COLLECTION_NAME_LENGTH)
+        self.assertEqual(vector_store.tenant_for_collection(build.collection_name), tenant)
+        self.assertNotEqual(vector_store.versioned_collection_name('a' * 49 + 'b', 123456), build.collection_name)
+
+
+class ItemListTests(TestCase):
+
+    def setUp(self):
+        self.client = Client(HTTP_HOST='localhost')
+
+    def create_item(self, content, **fields):
+        return PortfolioItem.objects.create(title=content[:20], content=content, **fields)
+
+    def search(self, query):
+        return self.client.get('/api/items/', {'q': query}).json()['results']
+
+    def test_cursor_pagination_visits_every_item_once(self):
+        ids = [self.create_item(f"Project {index}").pk for index in range(5)]
+        seen = []
+        url = '/api/items/?page_size=2'
+        while url:
+            page = self.client.get(url).json()
+            self.assertLessEqual(len(page['results']), 2)
+            seen += [item['id'] for item in page['results']]
+            url = page['next']
+        self.assertEqual(seen, sorted(ids, reverse=True))
+
+    def test_fields_projection(self):
+        item = self.create_item("Django developer resume")
+        results = self.client.get('/api/items/', {'fields': 'id,title'}).json()['results']
+        self.assertEqual(results, [{'id': item.pk, 'title': item.title}])
+        detail = self.client.get(f'/api/items/{item.pk}/', {'fields': 'id,content'}).json()
+        self.assertEqual(detail, {'id': item.pk, 'content': item.content})
+
+    def test_item_detail_is_scoped_to_the_tenant(self):
+        item = self.create_item("Acme resume", tenant='acme')
+        self.assertEqual(self.client.get(f'/api/items/{item.pk}/').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/items/{item.pk}/', {'tenant': 'other'}).status_code, 404)
+        self.assertEqual(self.client.get(f'/api/items/{item.pk}/', {'tenant': 'acme'}).json()['id'], item.pk)
+
+    def test_search_snippet_is_plain_text_with_match_offsets(self):
+        self.create_item("Experienced Django developer building <script>alert(1)</script> APIs")
+        self.create_item("Flask tutorials")
+        [result] = self.search("django")
+        self.assertIn("<script>", result['snippet'])
+        self.assertNotIn("<mark>", result['snippet'])
+        self.assertEqual([result['snippet'][start:end] for start, end in result['highlights']], ["Django"])
+
+    def test_index_follows_content_changes(self):
+        item = PortfolioItem.objects.create(title="Tutorials", content="Flask tutorials")
+        self.assertEqual(self.search("django"), [])
+        item.content = "Django tutorials"
+        item.save()
+        self.assertEqual([result['id'] for result in self.search("django")], [item.pk])
+        self.assertEqual(self.search("flask"), [])
+
+
+@override_settings(CONVERSATION_RECENT_TURNS=4, CONVERSATION_SUMMARY_BATCH=2, CONVERSATION_SUMMARY_MIN_TIME=5)
+class ConversationTests(IndexedTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create_item("Built a Django search service")
+        self.conversation = Conversation.objects.create()
+        patcher = mock.patch('assistant.llm.chat', return_value="Summary of the conversation")
+        self.chat = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def message(self, query):
+        response = self.client.post(
+            f'/api/conversations/{self.conversation.id}/messages/', {'query': query}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def record(self, count, deadline=None):
+        for n in range(count):
+            conversations.record_turn(self.conversation, f"question {n}", f"question {n}", "answer", deadline)
+        self.conversation.refresh_from_db()
+        return self.conversation.summarized_turns
+
+    def test_only_follow_ups_are_rewritten(self):
+        self.assertEqual(self.message("What did I build with Django?")['standalone_query'], "What did I build with Django?")
+        self.chat.assert_not_called()
+        self.chat.return_value = "Django search service"
+        self.assertEqual(self.message("How big was it?")['standalone_query'], "Django search service")
+
+    def test_summary_advances_by_batch(self):
+        self.assertEqual(self.record(5), 0)
+        self.chat.assert_not_called()
+        self.assertEqual(self.record(1), 2)
+        self.assertEqual(self.record(1), 2)
+        self.assertEqual(self.record(1), 4)
+        self.assertEqual(self.chat.call_count, 2)
+        self.assertEqual(self.conversation.summary, "Summary of the conversation")
+
+    def test_failed_summary_is_retried(self):
+        self.chat.side_effect = [llm.LLMError("provider down"), "Summary of the conversation"]
+        self.assertEqual(self.record(6), 0)
+        self.assertEqual(self.record(1), 3)
+        self.assertEqual(self.conversation.summary, "Summary of the conversation")
+
+    def test_summary_waits_when_deadline_is_close(self):
+        self.assertEqual(self.record(6, Deadline(1)), 0)
+        self.chat.assert_not_called()
+        self.assertEqual(self.record(1, Deadline(25)), 3)
+        self.assertIsNotNone(self.chat.call_args.kwargs['deadline'])
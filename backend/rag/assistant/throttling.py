@@ -0,0 +1,126 @@
+from collections import Counter
+from django.conf import settings
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import ScopedRateThrottle
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Limiter state lives in this process: nothing to deploy, and nothing shared between workers, so a
+# deployment with W workers admits up to W times the configured rates and in-flight caps.
+MAX_BUCKETS = 10000
+
+_buckets = {}  # key -> (tokens, last refill time, capacity, refill rate)
+_buckets_lock = threading.Lock()
+_in_flight = Counter()
+_in_flight_lock = threading.Lock()
+
+
+def take_token(key, capacity, refill_rate, now=None):
+    """
+    Takes one token from the bucket `key`, which holds up to `capacity` tokens and refills at
+    `refill_rate` tokens per second. Returns 0 on success, else the seconds until a token is available.
+    """
+    now = time.monotonic() if now is None else now
+    with _buckets_lock:
+        tokens, updated = _buckets.get(key, (capacity, now))[:2]
+        tokens = min(capacity, tokens + (now - updated) * refill_rate)
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0
+        else:
+            wait = (1 - tokens) / refill_rate
+        _buckets[key] = (tokens, now, capacity, refill_rate)
+        if len(_buckets) > MAX_BUCKETS:
+            _evict(now)
+    return wait
+
+
+def _evict(now):
+    # A bucket that has refilled completely behaves exactly like a missing one
+    for key, (tokens, updated, capacity, refill_rate) in list(_buckets.items()):
+        if tokens + (now - updated) * refill_rate >= capacity:
+            del _buckets[key]
+    # Under a flood of distinct clients, forget the least recently seen ones
+    if len(_buckets) > MAX_BUCKETS * 0.9:
+        by_age = sorted(_buckets, key=lambda key: _buckets[key][1])
+        for key in by_age[:len(_buckets) - int(MAX_BUCKETS * 0.9)]:
+            del _buckets[key]
+
+
+def reset():
+    """Forgets every bucket and in-flight count (tests and `manage.py shell` use)."""
+    with _buckets_lock:
+        _buckets.clear()
+    with _in_flight_lock:
+        _in_flight.clear()
+
+
+class TokenBucketThrottle(ScopedRateThrottle):
+    """
+    Per-client token bucket for views with a `throttle_scope`.
+
+    settings.RATE_LIMITS maps scopes to DRF rate strings: "30/min" lets a client burst 30 requests and
+    then refills one every two seconds. Scopes without a rate are not limited.
+    """
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None)
+        rate = settings.RATE_LIMITS.get(self.scope) if self.scope else None
+        if not rate:
+            return True
+        capacity, duration = self.parse_rate(rate)
+        self.delay = take_token(self.get_cache_key(request, view), capacity, capacity / duration)
+        if self.delay:
+            logger.warning(f"Rate limited {self.get_ident(request)} on {self.scope} for {self.delay:.1f}s")
+        return not self.delay
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def wait(self):
+        return self.delay
+
+
+def admit(scope):
+    """Claims an in-flight slot for `scope`; returns False when settings.MAX_IN_FLIGHT is reached."""
+    limit = settings.MAX_IN_FLIGHT.get(scope)
+    with _in_flight_lock:
+        if limit and _in_flight[scope] >= limit:
+            return False
+        _in_flight[scope] += 1
+    return True
+
+
+def release(scope):
+    with _in_flight_lock:
+        _in_flight[scope] -= 1
+
+
+class AdmissionControlMixin:
+    """
+    Sheds load on expensive endpoints: once settings.MAX_IN_FLIGHT[throttle_scope] requests are being
+    served, further ones get 429 with Retry-After instead of queueing behind them until they time out.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        # Rate limits are checked first, so over-limit clients never occupy a slot
+        super().initial(request, *args, **kwargs)
+        if not admit(self.throttle_scope):
+            logger.warning(f"Shedding {self.throttle_scope} request: {settings.MAX_IN_FLIGHT[self.throttle_scope]} in flight")
+            raise Throttled(wait=settings.LOAD_SHED_RETRY_AFTER, detail="Server is busy, please retry shortly.")
+        self.admitted = True
+
+    def dispatch(self, request, *args, **kwargs):
+        self.admitted = False
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self.admitted:
+                release(self.throttle_scope)
@@ -7,4 +7,9 @@ urlpatterns = [
     path('add-web-content/', views.AddWebContentView.as_view(), name='add_web_content'),
     path('add-existing-pdf/', views.AddExistingPDFView.as_view(), name='add_existing_pdf'),
     path('refresh-url/', views.RefreshURLView.as_view(), name='refresh_url'),
+    path('items/', views.PortfolioItemListView.as_view(), name='item_list'),
+    path('items/<int:pk>/', views.PortfolioItemDetailView.as_view(), name='item_detail'),
+    path('conversations/', views.ConversationCreateView.as_view(), name='conversation_create'),
+    path('conversations/<uuid:conversation_id>/', views.ConversationDetailView.as_view(), name='conversation_detail'),
+    path('conversations/<uuid:conversation_id>/messages/', views.ConversationMessageView.as_view(), name='conversation_message'),
 ]
\ No newline at end of file
@@ -0,0 +1,181 @@
+from django.conf import settings
+from collections import namedtuple
+import hashlib
+import re
+import logging
+
+from .models import IndexBuild
+
+logger = logging.getLogger(__name__)
+
+# Chroma metadata values must be scalars, so tags are flattened into boolean
+# keys and scalar metadata entries are copied over under a prefix.
+TAG_KEY_PREFIX = 'tag_'
+META_KEY_PREFIX = 'meta_'
+SCALAR_TYPES = (str, int, float, bool)
+
+IndexTarget = namedtuple('IndexTarget', ['collection_name', 'model_name'])
+
+# Chroma's limit, also the length of IndexBuild.collection_name
+MAX_COLLECTION_NAME_LENGTH = 63
+
+_client = None
+
+
+def normalize_key(value):
+    return re.sub(r'[^a-z0-9_]+', '_', str(value).strip().lower()).strip('_')
+
+
+def get_client():
+    """
+    Returns the vector store client selected by settings.VECTOR_STORE_BACKEND.
+
+    Backends provide the subset of the Chroma API used in this module: get_or_create_collection(),
+    list_collections() and delete_collection() on the client, and upsert(), delete(), query(), get()
+    and count() on collections. Distances are squared L2 in both.
+    """
+    global _client
+    if _client is None:
+        if settings.VECTOR_STORE_BACKEND == 'numpy':
+            from .numpy_index import NumpyClient
+            logger.info(f"Opening NumPy vector index at {settings.NUMPY_INDEX_PATH}")
+            _client = NumpyClient(
+                settings.NUMPY_INDEX_PATH,
+                dtype=settings.NUMPY_INDEX_DTYPE,
+                compact_ratio=settings.NUMPY_INDEX_COMPACT_RATIO
+            )
+        else:
+            from chromadb import PersistentClient
+            logger.info(f"Connecting to ChromaDB at {settings.CHROMA_DB_PATH}")
+            _client = PersistentClient(path=str(settings.CHROMA_DB_PATH))
+    return _client
+
+
+def collection_name(tenant=None):
+    """Returns the unversioned Chroma collection of a tenant, used until its first reindex."""
+    tenant = tenant or settings.DEFAULT_TENANT
+    if tenant == settings.DEFAULT_TENANT:
+        return settings.CHROMA_COLLECTION_PREFIX
+    return f"{settings.CHROMA_COLLECTION_PREFIX}-{tenant}"
+
+
+def versioned_collection_name(tenant, version):
+    # Tenants are slugs, so the "." separator can never be confused with a tenant name
+    suffix = f".v{version}"
+    name = collection_name(tenant)
+    if len(name) + len(suffix) > MAX_COLLECTION_NAME_LENGTH:
+        # Long tenant slugs are cut and made unique with a hash; the IndexBuild row maps the name back
+        digest = hashlib.sha256(name.encode()).hexdigest()[:8]
+        name = f"{name[:MAX_COLLECTION_NAME_LENGTH - len(suffix) - len(digest) - 1].rstrip('-_')}-{digest}"
+    return f"{name}{suffix}"
+
+
+def tenant_for_collection(name):
+    """Inverse of collection_name() and versioned_collection_name(); None for collections this app does not own."""
+    tenant = IndexBuild.objects.filter(collection_name=name).values_list('tenant', flat=True).first()
+    if tenant:
+        return tenant
+    name = re.sub(r'\.v\d+$', '', name)
+    prefix = settings.CHROMA_COLLECTION_PREFIX
+    if name == prefix:
+        return settings.DEFAULT_TENANT
+    if name.startswith(f"{prefix}-"):
+        return name[len(prefix) + 1:]
+    return None
+
+
+def active_index(tenant=None):
+    """
+    Resolves the collection (and the embedding model that built it) that a tenant reads and writes.
+
+    Args:
+        tenant: Tenant slug; defaults to settings.DEFAULT_TENANT.
+
+    Returns:
+        IndexTarget: The active build's collection, or the unversioned collection if the tenant was never reindexed.
+    """
+    tenant = tenant or settings.DEFAULT_TENANT
+    build = (
+        IndexBuild.objects.filter(tenant=tenant, status=IndexBuild.STATUS_ACTIVE)
+        .only('collection_name', 'model_name')
+        .first()
+    )
+    if build:
+        return IndexTarget(build.collection_name, build.model_name)
+    return IndexTarget(collection_name(tenant), settings.EMBEDDING_MODEL_NAME)
+
+
+def get_collection(tenant=None, target=None):
+    target = target or active_index(tenant)
+    return get_client().get_or_create_collection(target.collection_name)
+
+
+def list_tenants():
+    tenants = set()
+    for collection in get_client().list_collections():
+        tenant = tenant_for_collection(collection.name)
+        if tenant:
+            tenants.add(tenant)
+    return tenants
+
+
+def iter_indexed(tenant, batch_size, target=None):
+    """Yields (vector_id, metadata) for every vector in a tenant's collection, one page at a time."""
+    collection = get_collection(tenant, target)
+    offset = 0
+    while True:
+        page = collection.get(include=['metadatas'], limit=batch_size, offset=offset)
+        if not page['ids']:
+            return
+        for vector_id, metadata in zip(page['ids'], page['metadatas']):
+            yield vector_id, metadata or {}
+        offset += len(page['ids'])
+
+
+def build_metadata(item):
+    """
+    Flattens a PortfolioItem into filterable Chroma metadata.
+
+    Args:
+        item: The PortfolioItem being indexed.
+
+    Returns:
+        dict: Scalar metadata with first-class `tenant`, `source_type` and `tag_*` keys.
+    """
+    metadata = {
+        "title": item.title or "",
+        "content": (item.content or "")[:1000],
+        "source_type": item.source_type,
+        "source_url": item.source_url or "",
+        "tenant": item.tenant or settings.DEFAULT_TENANT,
+        "content_hash": item.content_hash or "",
+    }
+    extra = item.metadata if isinstance(item.metadata, dict) else {}
+    tags = extra.get('tags') or []
+    if isinstance(tags, str):
+        tags = [tags]
+    for tag in tags:
+        key = normalize_key(tag)
+        if key:
+            metadata[f"{TAG_KEY_PREFIX}{key}"] = True
+    for key, value in extra.items():
+        if key == 'tags' or not isinstance(value, SCALAR_TYPES):
+            continue
+        metadata[f"{META_KEY_PREFIX}{normalize_key(key)}"] = value
+    return metadata
+
+
+def build_where(source_types=None, tags=None):
+    """Builds a Chroma `where` filter, or None when nothing is filtered."""
+    clauses = []
+    if source_types:
+        clauses.append({"source_type": {"$in": list(source_types)}})
+    for tag in tags or []:
+        key = normalize_key(tag)
+        if key:
+            clauses.append({f"{TAG_KEY_PREFIX}{key}": True})
+    if not clauses:
+        return None
+    if len(clauses) == 1:
+        return clauses[0]
+    return {"$and": clauses}
@@ -1,25 +1,81 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import status
+from rest_framework import generics, status
+from rest_framework.pagination import CursorPagination
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from django.core.files.storage import FileSystemStorage
+from django.db.models.functions import Substr
 from django.conf import settings
-from .models import PortfolioItem
-from .serializers import QuerySerializer, PortfolioItemSerializer, UploadPDFSerializer, AddWebContentSerializer, AddExistingPDFSerializer
-from sentence_transformers import SentenceTransformer
-import chromadb
-import requests
-import PyPDF2
+from .models import PortfolioItem, Conversation, QueryLog
+from . import answers
+from . import vector_store
+from . import conversation as conversations
+from .deadline import Deadline, DeadlineExceeded
+from .throttling import AdmissionControlMixin
+from . import extraction
+from . import http_cache
+from . import llm
+from . import query_log
+from . import retrieval
+from . import search
+from .serializers import (
+    QuerySerializer, PortfolioItemSerializer, UploadPDFSerializer, AddWebContentSerializer, AddExistingPDFSerializer,
+    ConversationSerializer, ConversationMessageSerializer
+)
 import logging
 import os
 import base64
 from django.core.files.base import ContentFile
+from django.shortcuts import get_object_or_404
+from django.utils.text import slugify
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
-class QueryView(APIView):
-    """Handles user queries by retrieving relevant portfolio items and generating responses via the Groq API."""
+# Fields returned by list-style responses unless `fields` asks otherwise; `content` can be megabytes
+SUMMARY_FIELDS = ['id', 'title', 'snippet', 'highlights', 'source_type', 'source_url', 'created_at', 'updated_at', 'metadata', 'tenant']
+
+
+def requested_fields(request, default):
+    """Parses the comma-separated `fields` query parameter into a sparse fieldset."""
+    raw = request.query_params.get('fields')
+    if not raw:
+        return default
+    return [name.strip() for name in raw.split(',') if name.strip()]
+
+
+class ItemCursorPagination(CursorPagination):
+    """Keyset pagination on the primary key, so deep pages cost the same as the first one."""
+    page_size = settings.ITEMS_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-id'
+
+
+class ConditionalGetMixin:
+    """Answers GET with a 304 while the client's ETag is current, and adds validators otherwise."""
+
+    def get_etag(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        etag = self.get_etag(request, *args, **kwargs)
+        response = http_cache.not_modified(request, etag)
+        if response is None:
+            response = http_cache.set_validators(super().get(request, *args, **kwargs), etag)
+        return response
+
+
+def deadline_response(error):
+    logger.warning(str(error))
+    return Response(
+        {"error": "Request deadline exceeded", "details": f"No answer within {settings.QUERY_DEADLINE}s ({error.stage})"},
+        status=status.HTTP_504_GATEWAY_TIMEOUT
+    )
+
+class QueryView(AdmissionControlMixin, APIView):
+    """Handles user queries by retrieving relevant portfolio items and generating responses via the configured LLM providers."""
+    throttle_scope = 'query'
 
     def post(self, request):
         logger.info("Processing query request")
@@ -30,16 +86,59 @@ class QueryView(APIView):
                 {"error": "Invalid query data", "details": serializer.errors},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        return self.respond(serializer.validated_data)
 
-        query = serializer.validated_data['query']
-        logger.debug(f"Received query: {query}")
+    def get(self, request):
+        """
+        Same as POST with the parameters in the query string (`source_types` and `tags` repeated).
 
-        # Generate query embedding
+        Answers carry a weak ETag (generated text is not byte-for-byte reproducible) derived from the
+        index version, the tenant's active collection and the parameters, so a client or proxy that
+        asks again before any item changes gets a 304 without embedding, retrieval or generation.
+        """
+        serializer = QuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            logger.error(f"Invalid query data: {serializer.errors}")
+            return Response(
+                {"error": "Invalid query data", "details": serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        data = serializer.validated_data
+        etag = http_cache.make_etag(
+            'query', vector_store.active_index(data['tenant']).collection_name, data['query'], data['tenant'],
+            sorted(data['source_types']), sorted(data['tags']), data['include_content'], weak=True
+        )
+        response = http_cache.not_modified(request, etag)
+        if response is not None:
+            logger.info("Query answer not modified")
+            return response
+        return http_cache.set_validators(self.respond(data), etag)
+
+    def respond(self, data):
+        timer = query_log.StageTimer()
+        entry = QueryLog(endpoint=QueryLog.ENDPOINT_QUERY, tenant=data['tenant'], query=data['query'])
+        response = self.answer(data, timer, entry)
+        query_log.record(entry, timer, response.status_code)
+        return response
+
+    def answer(self, data, timer, entry):
+        """Runs embedding, retrieval and generation, filling in the query log entry along the way."""
+        query = data['query']
+        tenant = data['tenant']
+        where = vector_store.build_where(source_types=data['source_types'], tags=data['tags'])
+        logger.debug(f"Received query: {query} (tenant={tenant}, where={where})")
+        deadline = Deadline(settings.QUERY_DEADLINE)
+
+        # Generate query embedding with the model that built the tenant's active collection
         try:
-            logger.info("Loading SentenceTransformer model: all-MiniLM-L6-v2")
-            model = SentenceTransformer('all-MiniLM-L6-v2')
-            query_embedding = model.encode(query).tolist()
+            with timer.stage('embedding'):
+                target = vector_store.active_index(tenant)
+                query_embedding = retrieval.embed_query(query, target)
+            entry.embedding_hash = query_log.embedding_hash(query_embedding)
             logger.debug("Query embedding generated successfully")
+            deadline.check("embedding")
+        except DeadlineExceeded as e:
+            return deadline_response(e)
         except Exception as e:
             logger.error(f"Failed to generate query embedding: {str(e)}")
             return Response(
@@ -47,17 +146,43 @@ class QueryView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+        fields = None if data['include_content'] else SUMMARY_FIELDS
+
+        # Frequent questions are answered ahead of time; filtered queries always go through retrieval
+        if where is None:
+            try:
+                with timer.stage('precomputed'):
+                    matched = answers.match(tenant, query_embedding, target.model_name)
+            except Exception as e:
+                logger.error(f"Precomputed answer lookup failed: {str(e)}", exc_info=True)
+                matched = None
+            if matched:
+                answer, similarity = matched
+                logger.info(f"Serving precomputed answer {answer.id} (similarity={similarity:.3f})")
+                items = PortfolioItem.objects.filter(pk__in=[int(pk) for pk in answer.sources], tenant=tenant)
+                entry.precomputed = True
+                entry.retrieved_ids = sorted(int(pk) for pk in answer.sources)
+                entry.scores = [round(similarity, 4)]
+                return Response(
+                    {
+                        "response": answer.response,
+                        "items": PortfolioItemSerializer(items, many=True, fields=fields).data,
+                        "precomputed": True
+                    },
+                    status=status.HTTP_200_OK
+                )
+
         # Query ChromaDB
         try:
-            logger.info(f"Connecting to ChromaDB at {settings.CHROMA_DB_PATH}")
-            client = chromadb.PersistentClient(path=str(settings.CHROMA_DB_PATH))
-            collection = client.get_or_create_collection("portfolio")
-            results = collection.query(query_embeddings=[query_embedding], n_results=5)
-            vector_ids = results['ids'][0]
-            logger.info(f"Retrieved vector IDs: {vector_ids}")
-            items = PortfolioItem.objects.filter(vector_id__in=vector_ids)
-            context = [item.content for item in items]
+            with timer.stage('retrieval'):
+                retrieved = retrieval.retrieve(query_embedding, tenant, target, where=where)
+            items, context = retrieved.items, retrieved.context
+            entry.retrieved_ids = [item.pk for item in items]
+            entry.scores = [round(distance, 4) for _, distance in retrieved.candidates]
             logger.debug(f"Context retrieved: {context[:100]}...")
+            deadline.check("retrieval")
+        except DeadlineExceeded as e:
+            return deadline_response(e)
         except Exception as e:
             logger.error(f"ChromaDB query failed: {str(e)}", exc_info=True)
             return Response(
@@ -65,63 +190,42 @@ class QueryView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-        # Query Groq API
-        try:
-            logger.info(f"Sending request to Groq API with key: {settings.GROQ_API_KEY[:4]}...{settings.GROQ_API_KEY[-4:]}")
-            response = requests.post(
-                "https://api.groq.com/openai/v1/chat/completions",
-                json={
-                    "model": "llama-3.1-8b-instant",
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": "You are a portfolio assistant. Provide accurate responses based solely on the provided portfolio context."
-                        },
-                        {"role": "user", "content": f"Query: {query}\nContext: {context}"}
-                    ],
-                    "max_tokens": 500
-                },
-                headers={"Authorization": f"Bearer {settings.GROQ_API_KEY}"},
-                timeout=10
+        # Nothing in the portfolio is close enough to ground an answer, so skip the LLM entirely
+        if not items:
+            logger.info(f"No item within distance {settings.RETRIEVAL_MAX_DISTANCE}; answering as off-topic")
+            return Response(
+                {"response": settings.OFF_TOPIC_RESPONSE, "items": [], "off_topic": True},
+                status=status.HTTP_200_OK
             )
-            llm_response = response.json()
-            logger.debug(f"Groq API response: {llm_response}")
-
-            if response.status_code != 200:
-                logger.error(f"Groq API error: {llm_response.get('error', 'Unknown error')} (Status: {response.status_code})")
-                return Response(
-                    {"error": "Groq API request failed", "details": llm_response.get('error', 'Unknown error')},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-
-            if 'choices' not in llm_response or not llm_response['choices']:
-                logger.error(f"Invalid Groq API response: {llm_response}")
-                return Response(
-                    {"error": "Invalid response from Groq API", "details": str(llm_response)},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
 
-            response_text = llm_response['choices'][0]['message']['content']
-            logger.info("Groq API response received successfully")
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Groq API request failed: {str(e)}", exc_info=True)
+        # Generate the answer with whatever is left of the deadline
+        try:
+            with timer.stage('generation'):
+                completion = llm.chat_completion(llm.rag_messages(query, context), deadline=deadline)
+        except DeadlineExceeded as e:
+            return deadline_response(e)
+        except llm.LLMError as e:
             return Response(
-                {"error": "Groq API communication error", "details": str(e)},
+                {"error": e.message, "details": e.details},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+        entry.provider = completion.provider
+        entry.prompt_tokens = completion.prompt_tokens
+        entry.completion_tokens = completion.completion_tokens
 
-        item_serializer = PortfolioItemSerializer(items, many=True)
+        item_serializer = PortfolioItemSerializer(items, many=True, fields=fields)
         logger.info("Query processed successfully")
         return Response(
             {
-                "response": response_text,
+                "response": completion.text,
                 "items": item_serializer.data
             },
             status=status.HTTP_200_OK
         )
 
-class UploadPDFView(APIView):
+class UploadPDFView(AdmissionControlMixin, APIView):
     parser_classes = (MultiPartParser, FormParser, JSONParser)
+    throttle_scope = 'upload'
 
     def post(self, request):
         logger.info("Processing PDF upload request")
@@ -132,6 +236,7 @@ class UploadPDFView(APIView):
             file_data = request.data.get('file')
             title = request.data.get('title', '')
             metadata = request.data.get('metadata', {})
+            tenant = slugify(request.data.get('tenant') or '') or settings.DEFAULT_TENANT
 
             if not file_data:
                 logger.error("File data is missing in JSON request")
@@ -177,6 +282,7 @@ class UploadPDFView(APIView):
             file = serializer.validated_data['file']
             title = serializer.validated_data['title']
             metadata = serializer.validated_data['metadata']
+            tenant = serializer.validated_data['tenant']
         else:
             logger.warning("Unsupported Media Type for PDF upload")
             return Response(
@@ -193,21 +299,14 @@ class UploadPDFView(APIView):
         # Extract PDF content
         try:
             logger.info(f"Extracting text from PDF: {file_path}")
-            with open(file_path, 'rb') as f:
-                reader = PyPDF2.PdfReader(f)
-                content = ""
-                for page in reader.pages:
-                    text = page.extract_text()
-                    if text:
-                        content += text
-                content = content.strip()
-                if not content:
-                    logger.warning(f"No text extracted from PDF: {file_path}")
-                    return Response(
-                        {"error": "No text could be extracted from the PDF"},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                logger.debug(f"Extracted content (first 100 chars): {content[:100]}...")
+            content = extraction.extract_pdf_text(file_path)
+            if not content:
+                logger.warning(f"No text extracted from PDF: {file_path}")
+                return Response(
+                    {"error": "No text could be extracted from the PDF"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            logger.debug(f"Extracted content (first 100 chars): {content[:100]}...")
         except Exception as e:
             logger.error(f"PDF extraction failed: {str(e)}", exc_info=True)
             return Response(
@@ -217,7 +316,7 @@ class UploadPDFView(APIView):
 
         # Save PortfolioItem
         try:
-            if PortfolioItem.objects.filter(source_url=source_url).exists():
+            if PortfolioItem.objects.filter(source_url=source_url, tenant=tenant).exists():
                 logger.error(f"PortfolioItem with source_url {source_url} already exists")
                 return Response(
                     {"error": f"PortfolioItem with source_url {source_url} already exists"},
@@ -228,7 +327,8 @@ class UploadPDFView(APIView):
                 content=content,
                 source_type='pdf',
                 source_url=source_url,
-                metadata=metadata
+                metadata=metadata,
+                tenant=tenant
             )
             item.save()
             item_serializer = PortfolioItemSerializer(item)
@@ -247,8 +347,9 @@ class UploadPDFView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-class AddWebContentView(APIView):
+class AddWebContentView(AdmissionControlMixin, APIView):
     """Handles the addition of web content to the portfolio."""
+    throttle_scope = 'ingest'
 
     def post(self, request):
         """
@@ -273,10 +374,11 @@ class AddWebContentView(APIView):
         title = serializer.validated_data['title']
         source_type = serializer.validated_data['source_type']
         metadata = serializer.validated_data['metadata']
+        tenant = serializer.validated_data['tenant']
         logger.debug(f"Adding web content: URL={url}, Title={title}, Source Type={source_type}")
 
         try:
-            if PortfolioItem.objects.filter(source_url=url).exists():
+            if PortfolioItem.objects.filter(source_url=url, tenant=tenant).exists():
                 logger.error(f"PortfolioItem with source_url {url} already exists")
                 return Response(
                     {"error": f"PortfolioItem with source_url {url} already exists"},
@@ -286,7 +388,8 @@ class AddWebContentView(APIView):
                 title=title,
                 source_type=source_type,
                 source_url=url,
-                metadata=metadata
+                metadata=metadata,
+                tenant=tenant
             )
             item.save()
             item_serializer = PortfolioItemSerializer(item)
@@ -305,8 +408,9 @@ class AddWebContentView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-class AddExistingPDFView(APIView):
+class AddExistingPDFView(AdmissionControlMixin, APIView):
     """Handles the processing of existing PDF files for portfolio items."""
+    throttle_scope = 'upload'
 
     def post(self, request):
         """
@@ -330,6 +434,7 @@ class AddExistingPDFView(APIView):
         filename = serializer.validated_data['filename']
         title = serializer.validated_data['title']
         metadata = serializer.validated_data['metadata']
+        tenant = serializer.validated_data['tenant']
         logger.debug(f"Processing existing PDF: {filename}, Title: {title}")
 
         source_url = os.path.join('media', filename).replace('\\', '/')
@@ -345,21 +450,14 @@ class AddExistingPDFView(APIView):
         # Extract PDF content
         try:
             logger.info(f"Extracting text from existing PDF: {file_path}")
-            with open(file_path, 'rb') as f:
-                reader = PyPDF2.PdfReader(f)
-                content = ""
-                for page in reader.pages:
-                    text = page.extract_text()
-                    if text:
-                        content += text
-                content = content.strip()
-                if not content:
-                    logger.warning(f"No text extracted from PDF: {file_path}")
-                    return Response(
-                        {"error": "No text could be extracted from the PDF"},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                logger.debug(f"Extracted content (first 100 chars): {content[:100]}...")
+            content = extraction.extract_pdf_text(file_path)
+            if not content:
+                logger.warning(f"No text extracted from PDF: {file_path}")
+                return Response(
+                    {"error": "No text could be extracted from the PDF"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            logger.debug(f"Extracted content (first 100 chars): {content[:100]}...")
         except Exception as e:
             logger.error(f"PDF extraction failed: {str(e)}", exc_info=True)
             return Response(
@@ -369,7 +467,7 @@ class AddExistingPDFView(APIView):
 
         # Save PortfolioItem
         try:
-            if PortfolioItem.objects.filter(source_url=source_url).exists():
+            if PortfolioItem.objects.filter(source_url=source_url, tenant=tenant).exists():
                 logger.error(f"PortfolioItem with source_url {source_url} already exists")
                 return Response(
                     {"error": f"PortfolioItem with source_url {source_url} already exists"},
@@ -380,7 +478,8 @@ class AddExistingPDFView(APIView):
                 content=content,
                 source_type='pdf',
                 source_url=source_url,
-                metadata=metadata
+                metadata=metadata,
+                tenant=tenant
             )
             item.save()
             item_serializer = PortfolioItemSerializer(item)
@@ -399,3 +498,243 @@ class AddExistingPDFView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
             
+
+class RefreshURLView(AdmissionControlMixin, APIView):
+    """Re-scrapes a URL-backed portfolio item so its content and vector are refreshed."""
+    throttle_scope = 'ingest'
+
+    def post(self, request):
+        """
+        Re-scrapes the given URL and updates (or creates) the matching PortfolioItem.
+
+        Args:
+            request: The HTTP POST request containing the URL and optional title, source type, and metadata.
+
+        Returns:
+            Response: JSON response with the refreshed item details or an error message.
+        """
+        logger.info("Processing URL refresh request")
+        serializer = AddWebContentSerializer(data=request.data)
+        if not serializer.is_valid():
+            logger.error(f"Invalid refresh data: {serializer.errors}")
+            return Response(
+                {"error": "Invalid refresh data", "details": serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        url = serializer.validated_data['url']
+        tenant = serializer.validated_data['tenant']
+        item = PortfolioItem.objects.filter(source_url=url, tenant=tenant).first()
+        created = item is None
+        if created:
+            item = PortfolioItem(source_url=url, tenant=tenant)
+        item.source_type = serializer.validated_data['source_type']
+        if serializer.validated_data.get('title'):
+            item.title = serializer.validated_data['title']
+        if serializer.validated_data.get('metadata'):
+            item.metadata = serializer.validated_data['metadata']
+
+        try:
+            item.content = item.extract_web_content(url)
+        except Exception as e:
+            logger.error(f"Failed to refresh {url}: {str(e)}", exc_info=True)
+            return Response(
+                {"error": f"Failed to refresh {url}", "details": str(e)},
+                status=status.HTTP_502_BAD_GATEWAY
+            )
+
+        try:
+            # Saving enqueues a re-embed through the index outbox
+            item.save()
+        except Exception as e:
+            logger.error(f"Failed to save refreshed item: {str(e)}", exc_info=True)
+            return Response(
+                {"error": "Failed to save portfolio item", "details": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        logger.info(f"Refreshed PortfolioItem {item.id} from {url}")
+        return Response(
+            {
+                "message": "URL refreshed successfully",
+                "item": PortfolioItemSerializer(item).data
+            },
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+
+class PortfolioItemListView(ConditionalGetMixin, generics.ListAPIView):
+    """Lists a tenant's portfolio items, newest first, with optional full-text search."""
+    serializer_class = PortfolioItemSerializer
+    pagination_class = ItemCursorPagination
+    throttle_scope = 'browse'
+
+    def get_etag(self, request, *args, **kwargs):
+        return http_cache.make_etag('items', sorted(request.query_params.lists()))
+
+    def get_queryset(self):
+        params = self.request.query_params
+        queryset = PortfolioItem.objects.filter(tenant=params.get('tenant') or settings.DEFAULT_TENANT)
+        if params.get('source_type'):
+            queryset = queryset.filter(source_type=params['source_type'])
+        if 'content' not in requested_fields(self.request, SUMMARY_FIELDS):
+            queryset = queryset.defer('content').annotate(
+                content_prefix=Substr('content', 1, settings.SNIPPET_LENGTH + 1)
+            )
+        if params.get('q'):
+            queryset = search.search_items(queryset, params['q'])
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs['fields'] = requested_fields(self.request, SUMMARY_FIELDS)
+        return super().get_serializer(*args, **kwargs)
+
+
+class PortfolioItemDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
+    """Returns a single portfolio item of a tenant; `fields` selects a subset of its fields."""
+    serializer_class = PortfolioItemSerializer
+    throttle_scope = 'browse'
+
+    def get_tenant(self):
+        return self.request.query_params.get('tenant') or settings.DEFAULT_TENANT
+
+    def get_etag(self, request, *args, **kwargs):
+        return http_cache.make_etag('item', self.get_tenant(), kwargs['pk'], requested_fields(request, None))
+
+    def get_queryset(self):
+        return PortfolioItem.objects.filter(tenant=self.get_tenant())
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs['fields'] = requested_fields(self.request, None)
+        return super().get_serializer(*args, **kwargs)
+
+
+class ConversationCreateView(APIView):
+    """Starts a server-side conversation whose turns share history."""
+    throttle_scope = 'browse'
+
+    def post(self, request):
+        serializer = ConversationSerializer(data=request.data)
+        if not serializer.is_valid():
+            logger.error(f"Invalid conversation data: {serializer.errors}")
+            return Response(
+                {"error": "Invalid conversation data", "details": serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        conversation = serializer.save()
+        logger.info(f"Started conversation {conversation.id} for tenant {conversation.tenant}")
+        return Response(ConversationSerializer(conversation).data, status=status.HTTP_201_CREATED)
+
+
+class ConversationDetailView(APIView):
+    """Returns a conversation with its rolling summary and turns."""
+    throttle_scope = 'browse'
+
+    def get(self, request, conversation_id):
+        conversation = get_object_or_404(Conversation.objects.prefetch_related('turns'), pk=conversation_id)
+        return Response(ConversationSerializer(conversation).data, status=status.HTTP_200_OK)
+
+
+class ConversationMessageView(AdmissionControlMixin, APIView):
+    """Answers a follow-up within a conversation, retrieving with a standalone rewrite of the question."""
+    throttle_scope = 'query'
+
+    def post(self, request, conversation_id):
+        """
+        Rewrites the message using the conversation history, retrieves context and answers it.
+
+        Args:
+            request: The HTTP POST request containing the query and optional retrieval filters.
+            conversation_id: UUID of the conversation.
+
+        Returns:
+            Response: JSON response with the answer, the standalone query and the retrieved items.
+        """
+        conversation = get_object_or_404(Conversation, pk=conversation_id)
+        serializer = ConversationMessageSerializer(data=request.data)
+        if not serializer.is_valid():
+            logger.error(f"Invalid message data: {serializer.errors}")
+            return Response(
+                {"error": "Invalid message data", "details": serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        timer = query_log.StageTimer()
+        entry = QueryLog(
+            endpoint=QueryLog.ENDPOINT_CONVERSATION,
+            tenant=conversation.tenant,
+            query=serializer.validated_data['query']
+        )
+        response = self.answer(conversation, serializer.validated_data, timer, entry)
+        query_log.record(entry, timer, response.status_code)
+        return response
+
+    def answer(self, conversation, data, timer, entry):
+        query = data['query']
+        tenant = conversation.tenant
+        where = vector_store.build_where(source_types=data['source_types'], tags=data['tags'])
+        deadline = Deadline(settings.QUERY_DEADLINE)
+        turns = conversations.recent_turns(conversation)
+        with timer.stage('rewrite'):
+            standalone = conversations.standalone_query(conversation, query, turns, deadline)
+        entry.retrieval_query = standalone
+
+        try:
+            deadline.check("query rewrite")
+            with timer.stage('embedding'):
+                target = vector_store.active_index(tenant)
+                query_embedding = retrieval.embed_query(standalone, target)
+            entry.embedding_hash = query_log.embedding_hash(query_embedding)
+            with timer.stage('retrieval'):
+                retrieved = retrieval.retrieve(query_embedding, tenant, target, where=where)
+            items, context = retrieved.items, retrieved.context
+            entry.retrieved_ids = [item.pk for item in items]
+            entry.scores = [round(distance, 4) for _, distance in retrieved.candidates]
+            deadline.check("retrieval")
+        except DeadlineExceeded as e:
+            return deadline_response(e)
+        except Exception as e:
+            logger.error(f"Retrieval failed for conversation {conversation.id}: {str(e)}", exc_info=True)
+            return Response(
+                {"error": "Failed to retrieve portfolio items", "details": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        if not items:
+            logger.info(f"No item within distance {settings.RETRIEVAL_MAX_DISTANCE}; answering as off-topic")
+            conversations.record_turn(conversation, query, standalone, settings.OFF_TOPIC_RESPONSE)
+            return Response(
+                {
+                    "response": settings.OFF_TOPIC_RESPONSE,
+                    "standalone_query": standalone,
+                    "items": [],
+                    "off_topic": True
+                },
+                status=status.HTTP_200_OK
+            )
+
+        try:
+            with timer.stage('generation'):
+                completion = llm.chat_completion(
+                    conversations.answer_messages(conversation, turns, query, context), deadline=deadline
+                )
+        except DeadlineExceeded as e:
+            return deadline_response(e)
+        except llm.LLMError as e:
+            return Response(
+                {"error": e.message, "details": e.details},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        entry.provider = completion.provider
+        entry.prompt_tokens = completion.prompt_tokens
+        entry.completion_tokens = completion.completion_tokens
+
+        conversations.record_turn(conversation, query, standalone, completion.text, deadline)
+        fields = None if data['include_content'] else SUMMARY_FIELDS
+        return Response(
+            {
+                "response": completion.text,
+                "standalone_query": standalone,
+                "items": PortfolioItemSerializer(items, many=True, fields=fields).data
+            },
+            status=status.HTTP_200_OK
+        )
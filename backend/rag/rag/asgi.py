@@ -14,3 +14,12 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rag.settings')
 
 application = get_asgi_application()
+
+# Serving workers can load the embedding model and vector store up front (PRELOAD_MODELS=True)
+# instead of on the first query; migrate, shell and other commands never import this module.
+from django.conf import settings  # noqa: E402
+
+if settings.PRELOAD_MODELS:
+    from assistant.embeddings import preload  # noqa: E402
+
+    preload()
@@ -20,6 +20,43 @@ CHROMA_DB_PATH = os.getenv('CHROMA_DB_PATH', os.path.join(BASE_DIR, 'chroma_data
 if not CHROMA_DB_PATH:
     raise ValueError("CHROMA_DB_PATH not found in .env file")
 
+# VECTOR_STORE_BACKEND=chroma (default) or numpy: a memory-mapped .npy index per collection for
+# small deployments, without the chromadb dependency. int8 storage quarters the file size.
+VECTOR_STORE_BACKEND = os.getenv('VECTOR_STORE_BACKEND', 'chroma')
+if VECTOR_STORE_BACKEND not in ('chroma', 'numpy'):
+    raise ValueError(f"Unsupported VECTOR_STORE_BACKEND: {VECTOR_STORE_BACKEND} (expected 'chroma' or 'numpy')")
+NUMPY_INDEX_PATH = os.getenv('NUMPY_INDEX_PATH', os.path.join(BASE_DIR, 'vector_index'))
+NUMPY_INDEX_DTYPE = os.getenv('NUMPY_INDEX_DTYPE', 'float32')
+NUMPY_INDEX_COMPACT_RATIO = 0.25  # Compact once this share of rows are tombstones
+
+# OCR for PDF pages without a text layer (scans, image-only exports). Needs the pdftoppm (poppler)
+# and tesseract binaries; pages are OCRed in OCR_WORKERS processes, a document gets at most
+# OCR_DOCUMENT_TIMEOUT seconds, and results are cached per page under OCR_CACHE_PATH.
+OCR_ENABLED = os.getenv('OCR_ENABLED', 'False') == 'True'
+OCR_TESSERACT_CMD = os.getenv('OCR_TESSERACT_CMD', 'tesseract')
+OCR_PDFTOPPM_CMD = os.getenv('OCR_PDFTOPPM_CMD', 'pdftoppm')
+OCR_LANGUAGES = os.getenv('OCR_LANGUAGES', 'eng')  # Tesseract -l value, e.g. "eng+deu"
+OCR_DPI = int(os.getenv('OCR_DPI', '300'))
+OCR_WORKERS = int(os.getenv('OCR_WORKERS', '2'))
+OCR_DOCUMENT_TIMEOUT = float(os.getenv('OCR_DOCUMENT_TIMEOUT', '120'))
+OCR_CACHE_PATH = os.getenv('OCR_CACHE_PATH', os.path.join(BASE_DIR, 'ocr_cache'))
+
+# Each tenant gets its own Chroma collection; the default tenant keeps the original name
+CHROMA_COLLECTION_PREFIX = os.getenv('CHROMA_COLLECTION_PREFIX', 'portfolio')
+DEFAULT_TENANT = os.getenv('DEFAULT_TENANT', 'default')
+
+EMBEDDING_MODEL_NAME = os.getenv('EMBEDDING_MODEL_NAME', 'all-MiniLM-L6-v2')
+# Load ML/vector dependencies when a serving worker boots rather than on its first query
+PRELOAD_MODELS = os.getenv('PRELOAD_MODELS', 'False') == 'True'
+
+# Vector writes go through the index outbox; by default it is drained right after each commit
+INDEX_SYNC_ON_COMMIT = os.getenv('INDEX_SYNC_ON_COMMIT', 'True') == 'True'
+INDEX_SYNC_BATCH_SIZE = int(os.getenv('INDEX_SYNC_BATCH_SIZE', '64'))
+# Failed outbox entries are retried at most every INDEX_SYNC_RETRY_AFTER seconds and given up
+# after INDEX_SYNC_MAX_ATTEMPTS; reconcile_index retries and repairs them regardless
+INDEX_SYNC_MAX_ATTEMPTS = int(os.getenv('INDEX_SYNC_MAX_ATTEMPTS', '5'))
+INDEX_SYNC_RETRY_AFTER = int(os.getenv('INDEX_SYNC_RETRY_AFTER', '60'))
+
 # Security settings
 SECRET_KEY = os.getenv('DJANGO_SECRET_KEY', 'django-insecure-default-key')  # Default key for development
 DEBUG = os.getenv('DEBUG', 'False') == 'True'
@@ -81,12 +118,51 @@ TEMPLATES = [
 WSGI_APPLICATION = 'rag.wsgi.application'
 
 # Database
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE=sqlite (default) or postgres. SQLite runs in WAL mode so readers never block on
+# the ingestion writer; writers take the lock up front (IMMEDIATE) and wait up to the busy timeout.
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL').upper()
+SQLITE_BUSY_TIMEOUT = float(os.getenv('SQLITE_BUSY_TIMEOUT', '20'))  # seconds
+
+if DB_ENGINE == 'postgres':
+    DB_POOL = os.getenv('DB_POOL', 'False') == 'True'
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'rag'),
+            'USER': os.getenv('DB_USER', 'rag'),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', 'localhost'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            # Django's pool hands out connections per request, so persistent connections only apply without it
+            'CONN_MAX_AGE': 0 if DB_POOL else int(os.getenv('DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+                    'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+                    'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+                },
+            } if DB_POOL else {},
+        }
     }
-}
+elif DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                'timeout': SQLITE_BUSY_TIMEOUT,
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': (
+                    f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE};"
+                    "PRAGMA synchronous=NORMAL;"
+                ),
+            },
+        }
+    }
+else:
+    raise ValueError(f"Unsupported DB_ENGINE: {DB_ENGINE} (expected 'sqlite' or 'postgres')")
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -105,12 +181,108 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Item list/search API
+ITEMS_PAGE_SIZE = int(os.getenv('ITEMS_PAGE_SIZE', '20'))
+# Cacheable GET responses carry an ETag derived from the index version and may be reused for this
+# many seconds before clients and proxies revalidate (a 304 costs one tiny query).
+HTTP_CACHE_MAX_AGE = int(os.getenv('HTTP_CACHE_MAX_AGE', '0'))
+SNIPPET_LENGTH = 300  # characters of content returned instead of the full text
+SEARCH_SNIPPET_WORDS = 24
+
+# Conversations: the last CONVERSATION_RECENT_TURNS turns are sent verbatim (clipped to
+# CONVERSATION_TURN_CHARS each); older ones are folded into a rolling summary.
+CONVERSATION_RECENT_TURNS = int(os.getenv('CONVERSATION_RECENT_TURNS', '4'))
+CONVERSATION_TURN_CHARS = 1000
+CONVERSATION_SUMMARY_BATCH = 2
+CONVERSATION_SUMMARY_WORDS = 150
+CONVERSATION_SUMMARY_TOKENS = 300
+# The summary shares the request deadline; with less time left it waits for a later turn
+CONVERSATION_SUMMARY_MIN_TIME = float(os.getenv('CONVERSATION_SUMMARY_MIN_TIME', '5'))
+CONVERSATION_REWRITE_TOKENS = 64
+
+# LLM providers, tried in order. BACKEND is a provider class in assistant.llm (or any dotted
+# path); the remaining keys are passed to it lowercased. Any OpenAI-compatible endpoint can be
+# added through LLM_FALLBACK_*, e.g. the local mock server (`manage.py mock_llm_server`).
+LLM_PROVIDERS = [
+    {
+        'NAME': os.getenv('LLM_NAME', 'groq'),
+        'BACKEND': 'assistant.llm.OpenAICompatibleProvider',
+        'BASE_URL': os.getenv('LLM_BASE_URL', 'https://api.groq.com/openai/v1'),
+        'API_KEY': os.getenv('LLM_API_KEY', GROQ_API_KEY),
+        'MODEL': os.getenv('LLM_MODEL', 'llama-3.1-8b-instant'),
+        'TIMEOUT': float(os.getenv('LLM_TIMEOUT', '10')),
+    },
+]
+if os.getenv('LLM_FALLBACK_BASE_URL'):
+    LLM_PROVIDERS.append({
+        'NAME': os.getenv('LLM_FALLBACK_NAME', 'fallback'),
+        'BACKEND': 'assistant.llm.OpenAICompatibleProvider',
+        'BASE_URL': os.getenv('LLM_FALLBACK_BASE_URL'),
+        'API_KEY': os.getenv('LLM_FALLBACK_API_KEY', ''),
+        'MODEL': os.getenv('LLM_FALLBACK_MODEL', 'llama-3.1-8b-instant'),
+        'TIMEOUT': float(os.getenv('LLM_FALLBACK_TIMEOUT', '10')),
+    })
+if os.getenv('LLM_MOCK', 'False') == 'True':
+    LLM_PROVIDERS = [{'NAME': 'mock', 'BACKEND': 'assistant.llm.MockProvider'}]
+LLM_MAX_TOKENS = 500
+# Start the next provider in parallel when the current one has not answered after this many seconds (0 disables)
+LLM_HEDGE_AFTER = float(os.getenv('LLM_HEDGE_AFTER', '0'))
+# Skip a provider for LLM_CIRCUIT_RESET seconds after LLM_CIRCUIT_FAILURES consecutive failures
+LLM_CIRCUIT_FAILURES = int(os.getenv('LLM_CIRCUIT_FAILURES', '3'))
+LLM_CIRCUIT_RESET = float(os.getenv('LLM_CIRCUIT_RESET', '30'))
+# Overall time budget of a query, shared by embedding, retrieval and generation
+QUERY_DEADLINE = float(os.getenv('QUERY_DEADLINE', '25'))
+
+# Retrieval: candidates farther than RETRIEVAL_MAX_DISTANCE (squared L2; 2 - 2 * cosine for the
+# normalized default model) are dropped, the rest fill up to RETRIEVAL_CONTEXT_TOKENS of context.
+# When nothing is close enough the query is answered with OFF_TOPIC_RESPONSE and no LLM call.
+RETRIEVAL_MAX_DISTANCE = float(os.getenv('RETRIEVAL_MAX_DISTANCE', '1.5'))
+RETRIEVAL_MAX_RESULTS = int(os.getenv('RETRIEVAL_MAX_RESULTS', '20'))
+RETRIEVAL_CONTEXT_TOKENS = int(os.getenv('RETRIEVAL_CONTEXT_TOKENS', '3000'))
+OFF_TOPIC_RESPONSE = os.getenv(
+    'OFF_TOPIC_RESPONSE',
+    "I couldn't find anything in the portfolio about that. Try asking about projects, skills or experience."
+)
+
+# Queries whose embedding is at least this cosine-similar to a precomputed question get its stored answer
+PRECOMPUTED_ANSWER_SIMILARITY = float(os.getenv('PRECOMPUTED_ANSWER_SIMILARITY', '0.92'))
+
+# Query log: every answered query with its retrieved ids, distances, token counts and stage
+# timings, buffered in memory and bulk-inserted (see `manage.py query_report`)
+QUERY_LOG_ENABLED = os.getenv('QUERY_LOG_ENABLED', 'True') == 'True'
+QUERY_LOG_BATCH_SIZE = int(os.getenv('QUERY_LOG_BATCH_SIZE', '50'))
+QUERY_LOG_FLUSH_INTERVAL = float(os.getenv('QUERY_LOG_FLUSH_INTERVAL', '5'))  # seconds
+
+# Per-client token buckets by view `throttle_scope`: "30/min" allows a burst of 30 requests refilled at
+# 30 per minute; an empty rate disables the limit. query covers /query/ and conversation messages,
+# upload PDF ingestion, ingest web scraping, browse the cheap read endpoints.
+RATE_LIMITS = {
+    'query': os.getenv('RATE_LIMIT_QUERY', '30/min'),
+    'upload': os.getenv('RATE_LIMIT_UPLOAD', '10/min'),
+    'ingest': os.getenv('RATE_LIMIT_INGEST', '20/min'),
+    'browse': os.getenv('RATE_LIMIT_BROWSE', '300/min'),
+}
+# Concurrent requests per scope in each worker process; more are shed with 429 and
+# Retry-After: LOAD_SHED_RETRY_AFTER seconds. 0 disables the cap.
+MAX_IN_FLIGHT = {
+    'query': int(os.getenv('MAX_IN_FLIGHT_QUERY', '8')),
+    'upload': int(os.getenv('MAX_IN_FLIGHT_UPLOAD', '2')),
+    'ingest': int(os.getenv('MAX_IN_FLIGHT_INGEST', '4')),
+}
+LOAD_SHED_RETRY_AFTER = int(os.getenv('LOAD_SHED_RETRY_AFTER', '1'))
+
 REST_FRAMEWORK = {
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.MultiPartParser',
         'rest_framework.parsers.FormParser',
         'rest_framework.parsers.JSONParser',
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'assistant.throttling.TokenBucketThrottle',
+    ],
+    # Reverse proxies in front of the app; clients are identified by REMOTE_ADDR when 0, otherwise by the
+    # X-Forwarded-For entry that many hops back, so clients cannot pick their own throttle bucket
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', '0')),
 }
 # Internationalization
 LANGUAGE_CODE = 'en-us'
@@ -122,6 +294,10 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
+# Uploaded files are served by assistant.media (ETags, 304s, byte ranges); off by default outside DEBUG.
+# MEDIA_ACCEL_REDIRECT, e.g. "/protected-media/", hands the transfer to nginx via X-Accel-Redirect.
+SERVE_MEDIA = os.getenv('SERVE_MEDIA', str(DEBUG)) == 'True'
+MEDIA_ACCEL_REDIRECT = os.getenv('MEDIA_ACCEL_REDIRECT', '')
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 # Default primary key field type
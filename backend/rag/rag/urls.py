@@ -15,10 +15,12 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path,include
-from django.conf.urls.static import static
+from django.urls import path, re_path, include
 from django.conf import settings
+from assistant import media
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('assistant.urls'))
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+]
+if settings.SERVE_MEDIA:
+    urlpatterns.append(re_path(rf'^{settings.MEDIA_URL.lstrip("/")}(?P<path>.+)$', media.serve, name='media'))
\ No newline at end of file
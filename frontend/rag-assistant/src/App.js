@@ -4,6 +4,20 @@ import './App.css';
 
 const API_BASE = 'http://localhost:8000/api';
 
+// Search snippets are plain text; `highlights` holds [start, end) code point offsets of the matches
+function renderSnippet(item) {
+  const chars = Array.from(item.snippet || '');
+  const parts = [];
+  let position = 0;
+  (item.highlights || []).forEach(([start, end], idx) => {
+    parts.push(chars.slice(position, start).join(''));
+    parts.push(<mark key={idx}>{chars.slice(start, end).join('')}</mark>);
+    position = end;
+  });
+  parts.push(chars.slice(position).join(''));
+  return parts;
+}
+
 function App() {
   const [query, setQuery] = useState('');
   const [response, setResponse] = useState('');
@@ -85,7 +99,7 @@ function App() {
                     <h4 className="item-title">{item.title || 'Untitled'}</h4>
                     <span className={`badge badge-${item.source_type}`}>{item.source_type}</span>
                   </div>
-                  <p className="item-snippet">{(item.content || '').substring(0, 300)}{(item.content || '').length > 300 ? '…' : ''}</p>
+                  <p className="item-snippet">{renderSnippet(item)}</p>
                   {item.source_url && (
                     <a
                       className="link"